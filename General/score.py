@@ -5,6 +5,8 @@ this module defines the score functions we are using
 """"""""""""""""""""""""""""""""""""""""""" Imports """""""""""""""""""""""""""""""""""""""""""
 from General.utils import *
 import scipy.stats as stats
+import bisect
+from sklearn.neighbors import KNeighborsClassifier
 
 """"""""""""""""""""""""""""""""""""""""""" Class """""""""""""""""""""""""""""""""""""""""""""
 
@@ -14,15 +16,81 @@ class ScoreFunction(abc.ABC):
     An abstract class for ScoreFunction.
     """
     # Public Methods
-    def __init__(self, classifier: sklearn.base.ClassifierMixin = None, alpha: int = 1):
+    def __init__(self, classifier: sklearn.base.ClassifierMixin = None, alpha: int = 1, cache_path: Optional[str] = None,
+                 cache_size: Optional[int] = 1000000):
+        """
+        Init function.
+        :param classifier: sklearn's classifier.
+        :param alpha: the parameter of the score function.
+        :param cache_path: (optional) the path of a SQLite file that the scores are kept in across runs and processes.
+            the scores are keyed by the content of the dataset and the costs, the score function's class and parameters,
+            the given features (regardless of their order) and the new feature.
+        :param cache_size: the maximal number of scores in the file. if None, it is unbounded.
+        """
         super().__init__()
         self._classifier = classifier
         self._alpha = alpha
+        self._persistent_cache = None if cache_path is None else PersistentCache(cache_path, cache_size)
+        self._cache_source = None
+        self._cache_prefix = None
+
+    def __call__(self, train_samples: TrainSamples, given_features: GivenFeatures, new_feature: int, costs_list: list[float]) -> float:
+        return self.score_candidates(train_samples, given_features, [new_feature], costs_list)[0]
 
-    def __call__(self, *args, **kwargs):
-        return self._execute_function(*args, **kwargs)
+    def score_candidates(self, train_samples: TrainSamples, given_features: GivenFeatures, candidates: List[int],
+                         costs: list[float]) -> np.ndarray:
+        """
+        Scores adding each of the candidates to the given features. the scores that are in the persistent cache aren't
+        calculated again.
+        :param train_samples: training dataset.
+        :param given_features: list of the indices of the chosen features.
+        :param candidates: list of the indices of the candidate features.
+        :param costs: list of the costs of the features.
+        :return: array of the score of each candidate.
+        """
+        if self._persistent_cache is None:
+            return self._score_candidates(train_samples, given_features, candidates, costs)
+        prefix = f'{self._get_cache_prefix(train_samples, costs)}:{get_features_mask(given_features):x}'
+        keys = [f'{prefix}:{int(candidate)}' for candidate in candidates]
+        scores = self._persistent_cache.get_many(list(dict.fromkeys(keys)))
+        missing = list(dict.fromkeys(candidate for candidate, key in zip(candidates, keys) if key not in scores))
+        if missing:
+            new_scores = {f'{prefix}:{int(candidate)}': score for candidate, score in
+                          zip(missing, self._score_candidates(train_samples, given_features, missing, costs))}
+            self._persistent_cache.put_many(new_scores)
+            scores.update(new_scores)
+        return np.array([scores[key] for key in keys], dtype=float)
+
+    def get_params(self) -> dict:
+        """
+        :return: the parameters that the scores depend on, besides the dataset, the costs and the features.
+        """
+        return {'alpha': self._alpha, 'classifier': self._classifier}
 
     # Private Methods
+    def _score_candidates(self, train_samples: TrainSamples, given_features: GivenFeatures, candidates: List[int],
+                          costs: list[float]) -> np.ndarray:
+        """
+        Calculates the scores of adding each of the candidates to the given features, one by one.
+        """
+        return np.array([self._execute_function(train_samples=train_samples, given_features=given_features, new_feature=candidate,
+                                                costs_list=costs) for candidate in candidates], dtype=float)
+
+    def _get_cache_prefix(self, train_samples: TrainSamples, costs: list[float]) -> str:
+        """
+        Gets the digest of the dataset, the costs and the score function, that prefixes the keys in the persistent
+        cache. the digest of the last dataset and costs are found by identity.
+        :param train_samples: training dataset.
+        :param costs: list of the costs of the features.
+        :return: hexadecimal digest.
+        """
+        source = (train_samples.samples, train_samples.classes, costs)
+        if self._cache_source is None or any(current is not last for current, last in zip(source, self._cache_source)):
+            description = (get_dataset_fingerprint(train_samples, costs), get_parameters_digest({'score_function': self}))
+            self._cache_prefix = hashlib.sha256(repr(description).encode()).hexdigest()
+            self._cache_source = source
+        return self._cache_prefix
+
     @abc.abstractmethod
     def _execute_function(self, train_samples: TrainSamples, given_features: GivenFeatures,
                           new_feature: int, costs_list: list[float]) -> float:
@@ -35,26 +103,66 @@ class ScoreFunction(abc.ABC):
 class ScoreFunctionA(ScoreFunction):
     """"
     return the feature score according to the theory we explain in the PDF.
+    the absolute correlations between every pair of features, and between every feature and the classes, are
+    calculated once per dataset, so scoring is a lookup in the tables.
     """
     # Public Methods
-    def __init__(self, alpha: int = 1, classifier: sklearn.base.ClassifierMixin = None):
-        super().__init__(classifier, alpha)
+    def __init__(self, alpha: int = 1, classifier: sklearn.base.ClassifierMixin = None, tables_cache_size: Optional[int] = 4,
+                 cache_path: Optional[str] = None, cache_size: Optional[int] = 1000000):
+        """
+        Init function.
+        :param alpha: the weight of the correlation to the classes.
+        :param classifier: unused.
+        :param tables_cache_size: the maximal number of datasets that their correlations tables are kept.
+        :param cache_path: (optional) the path of the persistent scores cache.
+        :param cache_size: the maximal number of scores in the persistent cache.
+        """
+        super().__init__(classifier, alpha, cache_path, cache_size)
+        self._tables = LRUCache(tables_cache_size)
+        self._last_dataset = None
+        self._last_tables = None
 
     # Private Methods
+    def _score_candidates(self, train_samples: TrainSamples, given_features: GivenFeatures, candidates: List[int],
+                          costs: list[float]) -> np.ndarray:
+        """
+        Calculates the scores of adding each of the candidates to the given features.
+        :param train_samples: training dataset.
+        :param given_features: list of the indices of the chosen features.
+        :param candidates: list of the indices of the candidate features.
+        :param costs: list of the costs of the features.
+        :return: array of the score of each candidate.
+        """
+        features_correlations, classes_correlations = self._get_correlations_tables(train_samples)
+        candidates = np.asarray(candidates, dtype=int)
+        prices = np.asarray(costs, dtype=float)[candidates]
+        given_correlations = np.mean(features_correlations[np.ix_(np.asarray(given_features, dtype=int), candidates)], axis=0)
+        frac = classes_correlations[candidates] / self._alpha * given_correlations
+        return frac / prices
+
     def _execute_function(self, train_samples: TrainSamples, given_features: GivenFeatures,
                           new_feature: int, costs_list: list[float]) -> float:
-        price = costs_list[new_feature]
-        frac = (self._get_correlation_to_feature(train_samples.classes, new_feature, train_samples) /
-                self._alpha * self._get_correlation_to_given_features(train_samples, new_feature, given_features))
-        return frac / price
+        return self._score_candidates(train_samples, given_features, [new_feature], costs_list)[0]
 
-    def _get_correlation_to_given_features(self, train_samples, new_feature, given_features):
-        return np.mean([self._get_correlation_to_feature(train_samples.samples[int(f)], new_feature, train_samples)
-                        for f in given_features])
-
-    @staticmethod
-    def _get_correlation_to_feature(feature1, feature2, train_samples):
-        return np.abs(np.correlate(feature1, train_samples.samples[feature2])[0])
+    def _get_correlations_tables(self, train_samples: TrainSamples) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Gets the correlations tables of the dataset. the tables of the last dataset are found by identity, and the
+        others by the dataset's fingerprint.
+        :param train_samples: training dataset.
+        :return: matrix of the absolute correlations between the features, and array of the absolute correlations
+            between each feature and the classes.
+        """
+        dataset = (train_samples.samples, train_samples.classes)
+        if self._last_dataset is not None and all(current is last for current, last in zip(dataset, self._last_dataset)):
+            return self._last_tables
+        fingerprint = get_dataset_fingerprint(train_samples)
+        tables = self._tables.get(fingerprint)
+        if tables is None:
+            samples = np.asarray(train_samples.samples, dtype=float)
+            tables = np.abs(samples.T @ samples), np.abs(samples.T @ np.asarray(train_samples.classes, dtype=float))
+            self._tables.put(fingerprint, tables)
+        self._last_dataset, self._last_tables = dataset, tables
+        return tables
 
 
 class ScoreFunctionB(ScoreFunction):
@@ -62,32 +170,264 @@ class ScoreFunctionB(ScoreFunction):
     return the feature score according to the theory we explain in the PDF.
     """
     # Public Methods
-    def __init__(self, alpha: int = 1, classifier: sklearn.base.ClassifierMixin = None):
-        super().__init__(classifier, alpha)
+    def __init__(self, alpha: int = 1, classifier: sklearn.base.ClassifierMixin = None, certainty_cache_size: Optional[int] = 0,
+                 knn_backend: bool = False, leave_one_out: bool = False, sample_size: Optional[Union[int, float]] = None,
+                 random_state: Optional[int] = 0, cache_path: Optional[str] = None, cache_size: Optional[int] = 1000000):
+        """
+        Init function.
+        :param alpha: unused.
+        :param classifier: sklearn's classifier that the certainty is measured by.
+        :param certainty_cache_size: the maximal number of features subsets that their certainty is kept, so the
+            classifier isn't fitted again on a subset that was already scored. the columns are then ordered by the
+            features' indices. if 0, nothing is kept. if None, the cache is unbounded.
+        :param knn_backend: if True, the classifier must be a KNeighborsClassifier with uniform weights and euclidean
+            distance, and it isn't fitted- the squared distances between the samples on the given features are kept,
+            and each candidate's distances are the kept ones plus its own feature's. neighbors that are in the same
+            distance may be broken differently than sklearn does. requires O(n_samples^2) memory.
+        :param leave_one_out: if True, a sample isn't its own neighbor. requires knn_backend.
+        :param sample_size: (optional) approximate mode- the number of samples (int), or their fraction (float), that
+            the certainty is measured on. the subsample is stratified by the classes, and is drawn once per dataset.
+            if None, all the samples are used.
+        :param random_state: the seed of the subsample.
+        :param cache_path: (optional) the path of the persistent scores cache.
+        :param cache_size: the maximal number of scores in the persistent cache.
+        """
+        super().__init__(classifier, alpha, cache_path, cache_size)
+        if knn_backend and not self._is_euclidean_knn(classifier):
+            raise ValueError("knn_backend requires a KNeighborsClassifier with uniform weights and euclidean distance")
+        if leave_one_out and not knn_backend:
+            raise ValueError("leave_one_out requires knn_backend")
+        self._certainties = LRUCache(certainty_cache_size)
+        self._knn_backend = knn_backend
+        self._leave_one_out = leave_one_out
+        self._sample_size = sample_size
+        self._random_state = random_state
+        self._last_dataset = None
+        self._samples = None
+        self._classes = None
+        self._classes_indices = None
+        self._distances = None
+        self._distances_features = None
+
+    def score_with_variance(self, train_samples: TrainSamples, given_features: GivenFeatures, new_feature: int,
+                            costs_list: list[float]) -> Tuple[float, float]:
+        """
+        Scores adding the new feature to the given features, with the estimated variance of the score. in approximate
+        mode, the variance is of the subsample's mean entropy as an estimate of the whole dataset's, so callers can
+        fall back to exact scoring when it's too high. in exact mode, the variance is 0.
+        :param train_samples: training dataset.
+        :param given_features: list of the indices of the chosen features.
+        :param new_feature: the added feature.
+        :param costs_list: list of the costs of the features.
+        :return: the score and its variance.
+        """
+        samples, classes = self._get_samples(train_samples)
+        given_features, given_samples = self._get_given_samples(samples, given_features)
+        entropies = self._measure_entropies(samples, classes, given_features, new_feature, given_samples)
+        price = costs_list[new_feature]
+        sampled_num, samples_num = len(entropies), len(train_samples.classes)
+        variance = 0.0
+        if sampled_num < samples_num and sampled_num > 1:
+            variance = np.var(entropies, ddof=1) / sampled_num * (1 - sampled_num / samples_num) / price ** 2
+        return (1 - float(np.mean(entropies))) / price, float(variance)
+
+    def get_params(self) -> dict:
+        parameters = super().get_params()
+        parameters.update(knn_backend=self._knn_backend, leave_one_out=self._leave_one_out, sample_size=self._sample_size,
+                          random_state=self._random_state)
+        return parameters
 
     # Private Methods
+    def _score_candidates(self, train_samples: TrainSamples, given_features: GivenFeatures, candidates: List[int],
+                          costs: list[float]) -> np.ndarray:
+        """
+        Calculates the scores of adding each of the candidates to the given features. the given features' columns are
+        sliced once for all the candidates.
+        :param train_samples: training dataset.
+        :param given_features: list of the indices of the chosen features.
+        :param candidates: list of the indices of the candidate features.
+        :param costs: list of the costs of the features.
+        :return: array of the score of each candidate.
+        """
+        samples, classes = self._get_samples(train_samples)
+        given_features, given_samples = self._get_given_samples(samples, given_features)
+        scores = np.empty(len(candidates))
+        for index, candidate in enumerate(candidates):
+            scores[index] = self._get_certainty(samples, classes, given_features, candidate, given_samples) / costs[candidate]
+        return scores
+
     def _execute_function(self, train_samples: TrainSamples, given_features: GivenFeatures,
                           new_feature: int, costs_list: list[float]) -> float:
-        price = costs_list[new_feature]
-        certainty = self._get_certainty(train_samples, given_features, new_feature)
-        return certainty / price
+        return self._score_candidates(train_samples, given_features, [new_feature], costs_list)[0]
 
-    def _get_certainty(self, train_samples: TrainSamples, given_features: GivenFeatures,
-                       new_feature: int):
+    def _get_samples(self, train_samples: TrainSamples) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Gets a column-major copy of the dataset's samples (or of their subsample in approximate mode), so slicing
+        features copies contiguous memory. the copy is kept until a different dataset is scored, which also drops the
+        cached certainties.
+        :param train_samples: training dataset.
+        :return: the samples in Fortran order, and their classes.
+        """
+        dataset = (train_samples.samples, train_samples.classes)
+        if self._last_dataset is None or any(current is not last for current, last in zip(dataset, self._last_dataset)):
+            classes = np.asarray(train_samples.classes)
+            rows = self._get_subsample(classes)
+            self._samples = np.array(np.asarray(train_samples.samples)[rows], order='F')
+            self._classes = classes[rows]
+            self._last_dataset = dataset
+            self._certainties.clear()
+            self._classes_indices = np.unique(self._classes, return_inverse=True)[1].ravel()
+            self._distances, self._distances_features = None, None
+        return self._samples, self._classes
+
+    def _get_subsample(self, classes: np.ndarray) -> np.ndarray:
+        """
+        Draws a subsample of the rows, stratified by the classes- every class keeps its share (and at least one row).
+        :param classes: the classes of the samples.
+        :return: sorted array of the rows' indices, or all the rows if sample_size is None.
+        """
+        samples_num = len(classes)
+        if self._sample_size is None:
+            return np.arange(samples_num)
+        size = self._sample_size if isinstance(self._sample_size, (int, np.integer)) else int(round(self._sample_size * samples_num))
+        if size >= samples_num:
+            return np.arange(samples_num)
+        rng = np.random.default_rng(self._random_state)
+        rows = []
+        for label in np.unique(classes):
+            label_rows = np.flatnonzero(classes == label)
+            label_size = max(1, int(round(size * len(label_rows) / samples_num)))
+            rows.append(rng.choice(label_rows, size=min(label_size, len(label_rows)), replace=False))
+        return np.sort(np.concatenate(rows))
+
+    def _get_given_samples(self, samples: np.ndarray,
+                           given_features: GivenFeatures) -> Tuple[List[int], Optional[np.ndarray]]:
+        """
+        Slices the given features' columns, that are shared by all the candidates. in case of the certainty cache, the
+        columns are ordered by the features' indices.
+        :param samples: the samples in Fortran order.
+        :param given_features: list of the indices of the chosen features.
+        :return: the given features in the order of their columns, and their columns (None with the knn backend).
+        """
+        given_features = [int(feature) for feature in given_features]
+        if not self._certainties.is_disabled():
+            given_features.sort()
+        return given_features, None if self._knn_backend else samples[:, given_features]
+
+    def _get_certainty(self, samples: np.ndarray, classes: Classes, given_features: GivenFeatures, new_feature: int,
+                       given_samples: Optional[np.ndarray]) -> float:
         """
         return the level of certainty according to the theory we explain in the PDF.
+        :param samples: the samples in Fortran order.
+        :param classes: the classes of the samples.
+        :param given_features: list of the indices of the chosen features, in the order of their columns.
+        :param new_feature: the added feature.
+        :param given_samples: the columns of the given features, see _get_given_samples.
+        :return: level of certainty.
+        """
+        if self._certainties.is_disabled():
+            return self._measure_certainty(samples, classes, given_features, new_feature, given_samples)
+        key = tuple(sorted(given_features + [new_feature]))
+        certainty = self._certainties.get(key)
+        if certainty is None:
+            certainty = self._measure_certainty(samples, classes, given_features, new_feature, given_samples)
+            self._certainties.put(key, certainty)
+        return certainty
+
+    def _measure_certainty(self, samples: np.ndarray, classes: Classes, given_features: GivenFeatures, new_feature: int,
+                           given_samples: Optional[np.ndarray]) -> float:
+        """
+        Measures the level of certainty with the knn backend, or by fitting the classifier.
+        :param samples: the samples in Fortran order.
+        :param classes: the classes of the samples.
+        :param given_features: list of the indices of the chosen features, in the order of their columns.
+        :param new_feature: the added feature.
+        :param given_samples: the columns of the given features, see _get_given_samples.
         :return: level of certainty.
         """
-        new_features = np.append(given_features, [new_feature])
-        data = pd.DataFrame(train_samples.samples)
-        self._classifier.fit(data[new_features], train_samples.classes)
-        probabilities = self._classifier.predict_proba(data[new_features])
-        certainty = self._calc_total_certainty(probabilities)
-        return 1 - certainty
+        return 1 - float(np.mean(self._measure_entropies(samples, classes, given_features, new_feature, given_samples)))
+
+    def _measure_entropies(self, samples: np.ndarray, classes: Classes, given_features: GivenFeatures, new_feature: int,
+                           given_samples: Optional[np.ndarray]) -> np.ndarray:
+        """
+        Measures the entropy of the classifier's probabilities for each sample, with the knn backend or by fitting it.
+        the new feature's column is stacked onto the given features' columns- after them, or in the place of its index
+        in case of the certainty cache.
+        :param samples: the samples in Fortran order.
+        :param classes: the classes of the samples.
+        :param given_features: list of the indices of the chosen features, in the order of their columns.
+        :param new_feature: the added feature.
+        :param given_samples: the columns of the given features, see _get_given_samples.
+        :return: array of the entropy of each sample.
+        """
+        if self._knn_backend:
+            distances = self._get_distances(samples, given_features) + self._get_feature_distances(samples, new_feature)
+            return self._knn_entropies(distances)
+        if self._certainties.is_disabled():
+            position = len(given_features)
+        else:
+            position = bisect.bisect_left(given_features, new_feature)
+        columns = (given_samples[:, :position], samples[:, [new_feature]], given_samples[:, position:])
+        return self._fit_entropies(np.concatenate(columns, axis=1), classes)
+
+    def _get_distances(self, samples: np.ndarray, given_features: GivenFeatures) -> np.ndarray:
+        """
+        Gets the squared distances between the samples on the given features. the kept distances are extended if the
+        given features contain their features, and are calculated again otherwise.
+        :param samples: the samples in Fortran order.
+        :param given_features: list of the indices of the chosen features.
+        :return: matrix of shape (n_samples, n_samples).
+        """
+        features = frozenset(int(feature) for feature in given_features)
+        if self._distances_features is None or not self._distances_features <= features:
+            self._distances, self._distances_features = np.zeros((len(samples), len(samples))), frozenset()
+        for feature in sorted(features - self._distances_features):
+            self._distances += self._get_feature_distances(samples, feature)
+        self._distances_features = features
+        return self._distances
+
+    @staticmethod
+    def _get_feature_distances(samples: np.ndarray, feature: int) -> np.ndarray:
+        """
+        :return: the squared distances between the samples on the feature, of shape (n_samples, n_samples).
+        """
+        column = samples[:, feature].astype(float)
+        return np.square(column[:, np.newaxis] - column[np.newaxis, :])
+
+    def _knn_entropies(self, distances: np.ndarray) -> np.ndarray:
+        """
+        Measures the entropy of the nearest neighbors classifier's probabilities from the squared distances.
+        :param distances: matrix of the squared distances between the samples. it is changed by the function.
+        :return: array of the entropy of each sample.
+        """
+        samples_num = len(distances)
+        if self._leave_one_out:
+            np.fill_diagonal(distances, np.inf)
+        neighbors_num = min(self._classifier.n_neighbors, samples_num - self._leave_one_out)
+        neighbors = np.argpartition(distances, neighbors_num - 1, axis=1)[:, :neighbors_num]
+        counts = np.zeros((samples_num, self._classes_indices.max() + 1))
+        np.add.at(counts, (np.arange(samples_num)[:, np.newaxis], self._classes_indices[neighbors]), 1)
+        return self._calc_entropies(counts / neighbors_num)
+
+    @staticmethod
+    def _is_euclidean_knn(classifier: sklearn.base.ClassifierMixin) -> bool:
+        """
+        :return: True if the classifier is a nearest neighbors classifier that the knn backend can replace.
+        """
+        return (isinstance(classifier, KNeighborsClassifier) and classifier.weights == 'uniform' and
+                (classifier.metric == 'euclidean' or (classifier.metric == 'minkowski' and classifier.p == 2)))
+
+    def _fit_entropies(self, samples: np.ndarray, classes: Classes) -> np.ndarray:
+        """
+        Fits the classifier on the samples and measures the entropy of its probabilities on them.
+        :param samples: the columns of the features.
+        :param classes: the classes of the samples.
+        :return: array of the entropy of each sample.
+        """
+        self._classifier.fit(samples, classes)
+        probabilities = self._classifier.predict_proba(samples)
+        return self._calc_entropies(probabilities)
 
     @staticmethod
-    def _calc_total_certainty(probabilities):
-        res = 0
-        for row in probabilities:
-            res += stats.entropy(row)
-        return res / len(probabilities)
+    def _calc_entropies(probabilities: np.ndarray) -> np.ndarray:
+        return stats.entropy(probabilities, axis=1)
@@ -12,8 +12,15 @@ import sklearn
 import sklearn.preprocessing as pre
 import abc
 import random
+import collections
+import hashlib
+import os
+import pickle
+import sqlite3
+import tempfile
+import time
 
-from typing import Callable, Tuple, Type, List, Union, Optional
+from typing import Callable, Tuple, Type, List, Union, Optional, Hashable, Iterable
 from dataclasses import dataclass
 
 """"""""""""""""""""""""""""""""""" Definitions and Consts """""""""""""""""""""""""""""""""""
@@ -48,6 +55,228 @@ TrainSamples = Samples
 TestSamples = Samples
 
 
+class LRUCache(object):
+    """
+    Bounded cache that evicts the least recently used entry once it is full, and counts its hits and misses.
+    """
+    def __init__(self, max_size: Optional[int] = 1024):
+        """
+        Init function.
+        :param max_size: the maximal number of entries in the cache. if None, the cache is unbounded. if 0, nothing is
+            stored.
+        """
+        self._max_size = max_size
+        self._entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default=None):
+        """
+        Returns the value stored under the key and marks it as the most recently used entry.
+        :param key: the key of the entry.
+        :param default: the value that is returned if the key is not in the cache.
+        :return: the stored value, or default if the key is not in the cache.
+        """
+        if key not in self._entries:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def put(self, key: Hashable, value):
+        """
+        Stores the value under the key. if the cache is full, the least recently used entry is evicted.
+        :param key: the key of the entry.
+        :param value: the value for storing.
+        """
+        if self._max_size == 0:
+            return
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if self._max_size is not None and len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+
+    def keys(self) -> list:
+        """
+        :return: the keys in the cache, from the least recently used to the most recently used.
+        """
+        return list(self._entries.keys())
+
+    def items(self) -> list:
+        """
+        :return: the (key, value) entries in the cache, from the least recently used to the most recently used. the
+            counters and the order aren't changed.
+        """
+        return list(self._entries.items())
+
+    def clear(self):
+        """
+        Removes all the entries and resets the counters.
+        """
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def is_disabled(self) -> bool:
+        """
+        :return: True if the cache doesn't store anything.
+        """
+        return self._max_size == 0
+
+    def get_hit_rate(self) -> float:
+        """
+        :return: the fraction of the lookups that were found in the cache.
+        """
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class PersistentCache(object):
+    """
+    Cache of floats in a SQLite file, that is kept across runs and shared between processes. the file is in WAL mode,
+    so readers don't block each other or the writer, and concurrent writers wait for each other up to the timeout.
+    reads don't write- the keys that were read are marked as recently used by the next write. the size is checked when
+    the file is opened and after every write, and then the least recently used entries are evicted. the number of
+    entries is kept in the size table by triggers, so the check doesn't count the entries.
+    """
+    _MAX_TOUCHED_KEYS = 4096
+
+    def __init__(self, path: str, max_size: Optional[int] = 1000000, timeout: float = 30.0):
+        """
+        Init function.
+        :param path: the path of the SQLite file. it is created if it doesn't exist.
+        :param max_size: the maximal number of entries in the cache. if None, the cache is unbounded.
+        :param timeout: the number of seconds that a writer waits for the other writers.
+        """
+        self._path = path
+        self._max_size = max_size
+        self._timeout = timeout
+        self._connection = None
+        self._pid = None
+        self._touched_keys = {}
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state['_connection'], state['_pid'], state['_touched_keys'] = None, None, {}
+        return state
+
+    def __len__(self) -> int:
+        return self._get_connection().execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+
+    def get_many(self, keys: List[str]) -> dict:
+        """
+        Gets the values of the keys that are in the cache. the found keys are marked as recently used by the next
+        write, or once _MAX_TOUCHED_KEYS keys are waiting for it.
+        :param keys: the keys of the entries.
+        :return: dictionary of the found keys and their values.
+        """
+        if not keys:
+            return {}
+        connection = self._get_connection()
+        values = {}
+        for start in range(0, len(keys), 512):
+            chunk = keys[start:start + 512]
+            rows = connection.execute(f'SELECT key, value FROM entries WHERE key IN ({",".join("?" * len(chunk))})', chunk)
+            values.update((key, np.nan if value is None else value) for key, value in rows)
+        used = time.time_ns()
+        self._touched_keys.update((key, used) for key in values)
+        if len(self._touched_keys) >= self._MAX_TOUCHED_KEYS:
+            self.put_many({})
+        return values
+
+    def put_many(self, entries: dict):
+        """
+        Stores the entries and marks the keys that were read as recently used, in one transaction, and evicts the least
+        recently used entries if the cache is too big.
+        :param entries: dictionary of keys and their values.
+        """
+        if not entries and not self._touched_keys:
+            return
+        connection = self._get_connection()
+        touched_keys, self._touched_keys = self._touched_keys, {}
+        used = time.time_ns()
+
+        def statement():
+            connection.executemany('UPDATE entries SET used = MAX(used, ?) WHERE key = ?',
+                                   [(touched, key) for key, touched in touched_keys.items() if key not in entries])
+            connection.executemany('INSERT INTO entries (key, value, used) VALUES (?, ?, ?) '
+                                   'ON CONFLICT (key) DO UPDATE SET value = excluded.value, used = excluded.used',
+                                   [(key, float(value), used) for key, value in entries.items()])
+            self._evict()
+        self._write(statement)
+
+    def close(self):
+        """
+        Marks the keys that were read as recently used, and closes the connection of the current process.
+        """
+        if self._touched_keys and self._pid == os.getpid():
+            self.put_many({})
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """
+        :return: the connection of the current process- a connection isn't shared with forked processes.
+        """
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = sqlite3.connect(self._path, timeout=self._timeout, isolation_level=None)
+            self._pid = os.getpid()
+            self._touched_keys = {}
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('PRAGMA synchronous=NORMAL')
+            self._write(self._create_tables)
+        return self._connection
+
+    def _create_tables(self):
+        """
+        Creates the tables if they don't exist, and evicts the entries that are above the maximal size. the size table
+        holds the number of entries, and is updated by triggers in the transaction of every insert and delete- the
+        entries are upserted rather than replaced, since a replace doesn't fire the delete trigger. called in a write
+        transaction.
+        """
+        self._connection.execute('CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value REAL, used INTEGER NOT NULL)')
+        self._connection.execute('CREATE INDEX IF NOT EXISTS entries_used ON entries (used)')
+        self._connection.execute('CREATE TABLE IF NOT EXISTS size (entries INTEGER NOT NULL)')
+        if self._connection.execute('SELECT COUNT(*) FROM size').fetchone()[0] == 0:
+            self._connection.execute('INSERT INTO size (entries) SELECT COUNT(*) FROM entries')
+        self._connection.execute('CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries '
+                                 'BEGIN UPDATE size SET entries = entries + 1; END')
+        self._connection.execute('CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries '
+                                 'BEGIN UPDATE size SET entries = entries - 1; END')
+        self._evict()
+
+    def _evict(self):
+        """
+        Deletes the least recently used entries that are above the maximal size. called in a write transaction.
+        """
+        if self._max_size is None:
+            return
+        excess = self._connection.execute('SELECT entries FROM size').fetchone()[0] - self._max_size
+        if excess > 0:
+            self._connection.execute('DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY used LIMIT ?)', (excess,))
+
+    def _write(self, statement: Callable):
+        """
+        Executes the statement in a write transaction, that is taken at its start so concurrent writers wait for it.
+        :param statement: function that executes the statement on the connection.
+        """
+        self._connection.execute('BEGIN IMMEDIATE')
+        try:
+            statement()
+        except BaseException:
+            self._connection.execute('ROLLBACK')
+            raise
+        self._connection.execute('COMMIT')
+
+
 """"""""""""""""""""""""""""""""""""""""""" Methods """""""""""""""""""""""""""""""""""""""""""
 
 
@@ -178,6 +407,88 @@ def get_complementary_set(elements_list: Union, existing_elements: Union) -> set
     return set(elements_list) - set(existing_elements)
 
 
+def get_features_mask(features: Iterable[int]) -> int:
+    """
+    Gets a compact representation of a set of features- an integer that its i-th bit is on iff feature i is in the set.
+    :param features: indices of features.
+    :return: the bitmask of the features.
+    """
+    mask = 0
+    for feature in features:
+        mask |= 1 << int(feature)
+    return mask
+
+
+def get_dataset_fingerprint(train_samples: TrainSamples, features_costs: Optional[list] = None) -> str:
+    """
+    Gets a digest of the dataset's content, that identifies it across runs.
+    :param train_samples: dataset of samples and their classes.
+    :param features_costs: (optional) list of the costs of the features, that are included in the digest.
+    :return: hexadecimal digest.
+    """
+    digest = hashlib.sha256()
+    for array in (np.asarray(train_samples.samples), np.asarray(train_samples.classes)):
+        digest.update(str((array.dtype, array.shape)).encode())
+        digest.update(pickle.dumps(array.tolist()) if array.dtype == object else np.ascontiguousarray(array).tobytes())
+    if features_costs is not None:
+        digest.update(np.asarray(features_costs, dtype=float).tobytes())
+    return digest.hexdigest()
+
+
+def get_canonical_form(value) -> object:
+    """
+    Converts a value to a form of primitives and tuples only, that its repr is the same across runs- dictionaries and
+    sets are sorted, objects with get_params (sklearn's estimators, score functions and algorithms) are described by
+    their class and their parameters, functions and classes by their qualified name, and arrays by their digest.
+    :param value: the value, usually a parameter of an estimator or of an algorithm.
+    :return: the canonical form of the value.
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return 'ndarray', value.dtype.str, value.shape, hashlib.sha256(np.ascontiguousarray(value).tobytes()).hexdigest()
+    if isinstance(value, dict):
+        return tuple(sorted((str(key), get_canonical_form(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(get_canonical_form(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted((get_canonical_form(item) for item in value), key=repr))
+    if hasattr(value, 'get_params') and not isinstance(value, type):
+        return f'{type(value).__module__}.{type(value).__qualname__}', get_canonical_form(value.get_params())
+    if hasattr(value, '__qualname__'):
+        return f'{value.__module__}.{value.__qualname__}'
+    return f'{type(value).__module__}.{type(value).__qualname__}'
+
+
+def get_parameters_digest(parameters: dict) -> str:
+    """
+    Gets a digest of the parameters' canonical form, that identifies them across runs.
+    :param parameters: dictionary from the name of the parameter to its value.
+    :return: hexadecimal digest.
+    """
+    return hashlib.sha256(repr(get_canonical_form(parameters)).encode()).hexdigest()
+
+
+def dump_atomically(obj, path: str):
+    """
+    Pickles the object to the given path. the object is written to a temporary file that replaces the path at once, so
+    readers never see a partially written file.
+    :param obj: object for pickling.
+    :param path: the destination path.
+    """
+    handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+    try:
+        with os.fdopen(handle, 'wb') as file:
+            pickle.dump(obj, file)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
 def normalize_data(data):
     """
     Normalizes given data.
@@ -8,6 +8,50 @@ from General.utils import *
 """"""""""""""""""""""""""""""""""""""""""" Class """""""""""""""""""""""""""""""""""""""""""
 
 
+class ModelCache(object):
+    """
+    Bounded cache of fitted classifiers, keyed by the sorted subset of features that they were trained on.
+    """
+    def __init__(self, classifier: sklearn.base.ClassifierMixin, max_size: Optional[int] = 16):
+        """
+        Init function.
+        :param classifier: sklearn's classifier. every cached model is a fitted clone of it.
+        :param max_size: the maximal number of fitted models in the cache. if None, the cache is unbounded. if 0,
+            nothing is stored.
+        """
+        self._classifier = classifier
+        self._models = LRUCache(max_size)
+
+    def predict(self, train_samples: TrainSamples, samples: TestSamples, features: GivenFeatures) -> Classes:
+        """
+        Predicts the class labels for the provided data with a model that is trained on the given features only. the
+        model is fitted only if it isn't in the cache.
+        :param train_samples: training dataset that the model is fitted on.
+        :param samples: test samples of shape (n_samples, n_features), i.e samples are in the rows.
+        :param features: list of the indices of the features.
+        :return: Classes of shape (n_samples,) contains the class labels for each data sample.
+        """
+        key = tuple(sorted(set(features)))
+        model = self._models.get(key)
+        if model is None:
+            model = sklearn.base.clone(self._classifier)
+            model.fit(train_samples.samples[:, key], train_samples.classes)
+            self._models.put(key, model)
+        return model.predict(samples[:, key])
+
+    def clear(self):
+        """
+        Removes all the fitted models.
+        """
+        self._models.clear()
+
+    def get_hit_rate(self) -> float:
+        """
+        :return: the fraction of the predictions that used an already fitted model.
+        """
+        return self._models.get_hit_rate()
+
+
 class LearningAlgorithm(abc.ABC):
     """
     An abstract class for LearningAlgorithm.
@@ -34,21 +78,46 @@ class LearningAlgorithm(abc.ABC):
         """
         ...
 
+    def predict_batch(self, samples: TestSamples, queries: List[Tuple[GivenFeatures, float]]) -> np.ndarray:
+        """
+        Predicts the class labels for the provided data for every query.
+        :param samples: test samples of shape (n_samples, n_features), i.e samples are in the rows.
+        :param queries: list of (given features, maximal cost) pairs.
+        :return: array of shape (n_queries, n_samples) contains the class labels for each query and data sample.
+        """
+        return np.array([self.predict(samples, list(given_features), maximal_cost) for given_features, maximal_cost in queries])
+
 
 class SequenceAlgorithm(LearningAlgorithm):
     """
     An abstract naive algorithm that chooses simply features to add to the given features according to the given budget.
     """
+    _PLAN_SAVE_INTERVAL = 64
+
     # Public Methods
-    def __init__(self, classifier: sklearn.base.ClassifierMixin):
+    def __init__(self, classifier: sklearn.base.ClassifierMixin, model_cache_size: Optional[int] = 16,
+                 plan_cache_size: Optional[int] = 1024, plan_cache_path: Optional[str] = None):
         """
         Init function.
         :param classifier: sklearn's classifier. the function saves it and uses it later.
+        :param model_cache_size: the maximal number of fitted classifiers that are kept, one per bought subset of
+            features. if None, the cache is unbounded. if 0, the classifier is fitted on every prediction.
+        :param plan_cache_size: the maximal number of bought subsets that are kept, one per (given features, maximal
+            cost) query. if None, the cache is unbounded. if 0, the features are bought on every prediction.
+        :param plan_cache_path: (optional) a file that the bought subsets are saved to, and loaded from by fit if it was
+            written for the same algorithm, parameters (see get_params) and dataset. the new subsets are saved at the
+            end of predict_batch, every _PLAN_SAVE_INTERVAL new subsets of predict, by the next fit and by
+            save_plan_cache.
         """
         super().__init__()
         self._train_samples = None
         self._features_costs = []
         self._classifier = classifier
+        self._model_cache = ModelCache(classifier, model_cache_size)
+        self._plan_cache = LRUCache(plan_cache_size)
+        self._plan_cache_path = plan_cache_path
+        self._dataset_fingerprint = None
+        self._unsaved_plans = 0
 
     def fit(self, train_samples: TrainSamples, features_costs: list[float]):
         """
@@ -58,8 +127,14 @@ class SequenceAlgorithm(LearningAlgorithm):
         :param features_costs: list in length number of features that contains the costs of each feature according to
         indices. in first index you will find the cost of the first feature, etc. the function saves it.
         """
+        self.save_plan_cache()
         self._train_samples = train_samples
         self._features_costs = features_costs
+        self._model_cache.clear()
+        self._plan_cache.clear()
+        if self._plan_cache_path is not None:
+            self._dataset_fingerprint = get_dataset_fingerprint(train_samples, features_costs)
+            self._load_plan_cache()
 
     def predict(self, samples: TestSamples, given_features: GivenFeatures, maximal_cost: float) -> Classes:
         """
@@ -71,11 +146,83 @@ class SequenceAlgorithm(LearningAlgorithm):
         :param maximal_cost: the maximum available cost for buying features.
         :return: Classes of shape (n_samples,) contains the class labels for each data sample.
         """
-        given_features = self._buy_features(given_features, maximal_cost)
-        self._classifier.fit(self._train_samples.samples[:, given_features], self._train_samples.classes)
-        return self._classifier.predict(samples[:, given_features])
+        given_features = self._get_plan(given_features, maximal_cost)
+        if self._unsaved_plans >= self._PLAN_SAVE_INTERVAL:
+            self.save_plan_cache()
+        return self._model_cache.predict(self._train_samples, samples, given_features)
+
+    def predict_batch(self, samples: TestSamples, queries: List[Tuple[GivenFeatures, float]]) -> np.ndarray:
+        """
+        Predicts the class labels for the provided data for every query. the features are bought once per distinct
+        query, and the classifier is fitted and predicts once per distinct bought subset of features.
+        :param samples: test samples of shape (n_samples, n_features), i.e samples are in the rows.
+        :param queries: list of (given features, maximal cost) pairs.
+        :return: array of shape (n_queries, n_samples) contains the class labels for each query and data sample.
+        """
+        queries = [(tuple(given_features), maximal_cost) for given_features, maximal_cost in queries]
+        subsets = {}
+        for query in dict.fromkeys(queries):
+            given_features, maximal_cost = query
+            subsets[query] = tuple(sorted(set(self._get_plan(given_features, maximal_cost))))
+        self.save_plan_cache()
+        predictions = {subset: self._model_cache.predict(self._train_samples, samples, subset)
+                       for subset in dict.fromkeys(subsets.values())}
+        return np.array([predictions[subsets[query]] for query in queries])
+
+    def get_plan_cache_hit_rate(self) -> float:
+        """
+        :return: the fraction of the queries that their bought features were found in the plan cache.
+        """
+        return self._plan_cache.get_hit_rate()
+
+    def save_plan_cache(self):
+        """
+        Saves the plan cache to plan_cache_path, if it has subsets that weren't saved yet.
+        """
+        if self._plan_cache_path is not None and self._unsaved_plans:
+            dump_atomically((self._get_plan_cache_key(), self._plan_cache.items()), self._plan_cache_path)
+        self._unsaved_plans = 0
+
+    def get_params(self) -> dict:
+        """
+        :return: the parameters that the bought features depend on, besides the dataset and the query.
+        """
+        return {'classifier': self._classifier}
 
     # Private Methods
+    def _get_plan(self, given_features: GivenFeatures, maximal_cost: float) -> GivenFeatures:
+        """
+        Gets the features that are bought for the query from the plan cache, or buys them if they aren't there.
+        :param given_features: list of the indices of the chosen features. the list isn't changed.
+        :param maximal_cost: the maximum available cost for buying features.
+        :return: a new list of the given features including all the chosen features.
+        """
+        key = (frozenset(given_features), maximal_cost)
+        plan = self._plan_cache.get(key)
+        if plan is None:
+            plan = tuple(self._buy_features(list(given_features), maximal_cost))
+            self._plan_cache.put(key, plan)
+            self._unsaved_plans += 1
+        return list(plan)
+
+    def _get_plan_cache_key(self) -> tuple:
+        """
+        :return: the identifier of the algorithm, its parameters and the dataset that a saved plan cache must match.
+        """
+        return type(self).__name__, get_parameters_digest(self.get_params()), self._dataset_fingerprint
+
+    def _load_plan_cache(self):
+        """
+        Loads the plan cache from plan_cache_path if it was saved for the same algorithm, parameters and dataset.
+        """
+        if not os.path.exists(self._plan_cache_path):
+            return
+        with open(self._plan_cache_path, 'rb') as file:
+            key, plans = pickle.load(file)
+        if key == self._get_plan_cache_key():
+            for query, plan in plans:
+                self._plan_cache.put(query, plan)
+
     @abc.abstractmethod
     def _buy_features(self, given_features: GivenFeatures, maximal_cost: float) -> GivenFeatures:
         """
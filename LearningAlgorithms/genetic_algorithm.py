@@ -5,11 +5,291 @@ This module contains a search algorithm based on a genetic algorithm
 """"""""""""""""""""""""""""""""""""""""""" Imports """""""""""""""""""""""""""""""""""""""""""
 from General.utils import *
 from sklearn.linear_model import LogisticRegression
+from sklearn.dummy import DummyClassifier
 from sklearn.metrics import accuracy_score
 from deap import creator, base, tools, algorithms
 from sklearn.model_selection import train_test_split
+from concurrent.futures import ProcessPoolExecutor
+import bisect
+import os
 
 from LearningAlgorithms.abstract_algorithm import SequenceAlgorithm
+
+""""""""""""""""""""""""""""""""""" Definitions and Consts """""""""""""""""""""""""""""""""""
+
+Genome = List[int]
+
+# the keys of the splits of the train samples- the genomes are scored on the test split during the evolution, and the
+# hall of fame is scored on the validation split.
+TEST_SPLIT = "test"
+VALIDATION_SPLIT = "validation"
+
+# the fraction of the train data of the split that the genomes are trained on when they are fully scored.
+FULL_FIDELITY = 1.0
+
+# the engines that evolve the population- DEAP's individuals, or a single boolean matrix of shape (population, genome).
+DEAP_ENGINE = "deap"
+NUMPY_ENGINE = "numpy"
+
+# the objectives of the evolution- the accuracy of the subsets under the query's budget, or the pareto front of the
+# (validation accuracy, cost) of the subsets, which answers every budget.
+ACCURACY_OBJECTIVE = "accuracy"
+PARETO_OBJECTIVE = "pareto"
+
+
+class GenomeScorer(object):
+    """
+    Scores genomes on the splits of the train samples. in case of parallel evaluation, the scorer is sent once to each
+    worker of the process pool.
+    the splits are one-hot encoded once, at the initialization, to contiguous matrices with a map from each feature to
+    its range of columns, so scoring a genome only gathers the columns of its features.
+    """
+    def __init__(self, splits: dict, max_iter: int, fidelities: Iterable[float] = (), random_state: Optional[int] = None):
+        """
+        Init function for GenomeScorer.
+        :param splits: dictionary from the key of the split to its (X_train, X_test, y_train, y_test).
+        :param max_iter: maximum number of iterations for the logistic regression.
+        :param fidelities: fractions of the train data that the genomes may be scored on. for each fraction, a stratified
+            subsample of the train data of every split, except the validation split which is always fully scored, is
+            drawn once.
+        :param random_state: controls the subsamples.
+        """
+        self._max_iter = max_iter
+        self._encoded_splits = {split: self._encode_split(*data) for split, data in splits.items()}
+        self._fidelity_rows = {(split, fidelity): self._get_subsample(data[2], fidelity, random_state)
+                               for split, data in splits.items() if split != VALIDATION_SPLIT
+                               for fidelity in set(fidelities) if fidelity < FULL_FIDELITY}
+
+    def score(self, split: str, individual: Genome, fidelity: float = FULL_FIDELITY) -> float:
+        """
+        trains a model on the features of the genome and returns its accuracy. the features that are not covered by
+        the genome are always used.
+        :param split: the key of the split that the genome is scored on.
+        :param individual: genome.
+        :param fidelity: the fraction of the train data of the split that the model is trained on.
+        :return: accuracy
+        """
+        X_train, X_test, y_train, y_test, columns_ranges = self._encoded_splits[split]
+        wanted_features = [index for index in range(len(columns_ranges)) if index >= len(individual) or individual[index] == 1]
+        columns = np.concatenate([np.arange(*columns_ranges[index]) for index in wanted_features] + [np.empty(0, dtype=int)])
+        rows = self._fidelity_rows.get((split, fidelity), np.arange(len(y_train)))
+
+        # a model without features predicts the most frequent class
+        clf = LogisticRegression(max_iter=self._max_iter) if len(columns) else DummyClassifier(strategy="most_frequent")
+        clf.fit(X_train[np.ix_(rows, columns)], y_train[rows])
+        predictions = clf.predict(X_test[:, columns])
+        return accuracy_score(y_test, predictions)
+
+    def get_features_values(self, split: str) -> np.ndarray:
+        """
+        estimates the value of each feature as the maximal absolute correlation between the classes and the columns of
+        the feature in the train data of the split.
+        :param split: the key of the split.
+        :return: array of the value of each feature.
+        """
+        X_train, _, y_train, _, columns_ranges = self._encoded_splits[split]
+        classes = np.unique(y_train, return_inverse=True)[1].astype(float)
+        centered_X, centered_classes = X_train - X_train.mean(axis=0), classes - classes.mean()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            correlations = np.abs(centered_X.T @ centered_classes) / (np.linalg.norm(centered_X, axis=0) * np.linalg.norm(centered_classes))
+        correlations = np.nan_to_num(correlations)
+        return np.array([correlations[start:end].max() if end > start else 0 for start, end in columns_ranges])
+
+    @staticmethod
+    def _get_subsample(y_train, fidelity: float, random_state: Optional[int]) -> np.ndarray:
+        """
+        draws a stratified subsample of the train data. the size of the subsample is at least the number of the classes.
+        if the classes are too small for stratifying, the subsample is drawn uniformly, and if it can't be drawn or it
+        misses a class, the whole train data is used.
+        :param y_train: the classes of the train data.
+        :param fidelity: the fraction of the train data in the subsample.
+        :param random_state: controls the subsample.
+        :return: the sorted indices of the rows in the subsample.
+        """
+        rows = np.arange(len(y_train))
+        classes_num = len(np.unique(y_train))
+        train_size = min(max(int(round(fidelity * len(rows))), classes_num), len(rows))
+        if train_size >= len(rows):
+            return rows
+        try:
+            rows = train_test_split(rows, train_size=train_size, stratify=y_train, random_state=random_state)[0]
+        except ValueError:
+            try:
+                rows = train_test_split(rows, train_size=train_size, random_state=random_state)[0]
+            except ValueError:
+                return np.arange(len(y_train))
+        if len(np.unique(y_train[rows])) < classes_num:
+            return np.arange(len(y_train))
+        return np.sort(rows)
+
+    @staticmethod
+    def _encode_split(X_train, X_test, y_train, y_test) -> tuple:
+        """
+        one-hot encodes the features of the split as pandas' get_dummies does- categorical features are encoded to one
+        column per category which appears both in the train and the test data, and numerical features are kept as is.
+        :return: tuple of the encoded X_train and X_test, y_train, y_test and a list of the columns range of each feature.
+        """
+        train_blocks, test_blocks, columns_ranges = [], [], []
+        for feature in range(X_train.shape[1]):
+            train_block = pd.get_dummies(pd.DataFrame(X_train[:, [feature]]))
+            test_block = pd.get_dummies(pd.DataFrame(X_test[:, [feature]]))
+            test_columns = set(test_block.columns)
+            shared_columns = [column for column in train_block.columns if column in test_columns]
+            start = columns_ranges[-1][1] if len(columns_ranges) else 0
+            train_blocks.append(train_block[shared_columns].to_numpy(dtype=float))
+            test_blocks.append(test_block[shared_columns].to_numpy(dtype=float))
+            columns_ranges.append((start, start + len(shared_columns)))
+        return (np.ascontiguousarray(np.hstack(train_blocks)), np.ascontiguousarray(np.hstack(test_blocks)),
+                y_train, y_test, columns_ranges)
+
+
+# the state of the current worker process, see _init_worker.
+_worker_scorer: Optional[GenomeScorer] = None
+_worker_cache = LRUCache()
+
+
+def _init_worker(scorer: GenomeScorer, cache_size: Optional[int] = 4096):
+    """
+    Initializer for the workers of the process pool- saves the scorer (and with it the splits) once per worker. the
+    query's costs and budget are sent with every task, so the workers are kept across the queries.
+    :param scorer: the GenomeScorer of the fitted GeneticAlgorithm.
+    :param cache_size: the maximal number of accuracies that the worker keeps.
+    """
+    global _worker_scorer, _worker_cache
+    _worker_scorer = scorer
+    _worker_cache = LRUCache(cache_size)
+
+
+def _score_in_worker(split: str, individual: Genome, fidelity: float = FULL_FIDELITY) -> float:
+    """
+    Scores a genome with the scorer of the current worker process.
+    :param split: the key of the split that the genome is scored on.
+    :param individual: genome.
+    :param fidelity: the fraction of the train data of the split that the genome is scored on.
+    :return: accuracy
+    """
+    return _worker_scorer.score(split, individual, fidelity)
+
+
+def _evaluate_in_worker(split: str, genomes: np.ndarray, genome_costs: np.ndarray, max_cost: float) -> np.ndarray:
+    """
+    The fitness function of the current worker process- illegal genomes get -1, and the accuracies of the legal ones
+    are cached in the worker.
+    :param split: the key of the split that the genomes are scored on.
+    :param genomes: boolean matrix of shape (genomes number, genome length).
+    :param genome_costs: the cost of each genome's position in the current query.
+    :param max_cost: the limit of all the bought features cost in the current query.
+    :return: the fitness of each genome.
+    """
+    fitness = np.full(len(genomes), -1.0)
+    for index in np.flatnonzero(genomes @ genome_costs <= max_cost):
+        key = (split, FULL_FIDELITY, get_features_mask(np.flatnonzero(genomes[index])))
+        accuracy = _worker_cache.get(key)
+        if accuracy is None:
+            accuracy = _worker_scorer.score(split, genomes[index])
+            _worker_cache.put(key, accuracy)
+        fitness[index] = accuracy
+    return fitness
+
+
+def _select_tournament(rng: np.random.Generator, fitness: np.ndarray, tournsize: int) -> np.ndarray:
+    """
+    Tournament selection of a whole population at once.
+    :param rng: random generator.
+    :param fitness: the fitness of each individual.
+    :param tournsize: the number of aspirants in each tournament.
+    :return: the indices of the chosen individuals.
+    """
+    aspirants = rng.integers(0, len(fitness), size=(len(fitness), tournsize))
+    return aspirants[np.arange(len(fitness)), np.argmax(fitness[aspirants], axis=1)]
+
+
+def _vary(rng: np.random.Generator, pop: np.ndarray, cxpb: float, mutpb: float, indpb: float) -> np.ndarray:
+    """
+    One point crossover of each consecutive pair with probability cxpb, and then flip bit mutation of each individual
+    with probability mutpb, as DEAP's varAnd does. the population is changed in place.
+    :param rng: random generator.
+    :param pop: boolean matrix of shape (population, genome length).
+    :return: boolean array of the individuals that were changed.
+    """
+    pop_size, genome_size = pop.shape
+    invalid = np.zeros(pop_size, dtype=bool)
+
+    pairs = np.flatnonzero(rng.random(pop_size // 2) < cxpb) * 2
+    if genome_size > 1 and len(pairs):
+        points = rng.integers(1, genome_size, size=len(pairs))
+        tails = np.arange(genome_size) >= points[:, None]
+        first, second = pop[pairs], pop[pairs + 1]
+        pop[pairs], pop[pairs + 1] = np.where(tails, second, first), np.where(tails, first, second)
+        invalid[pairs] = invalid[pairs + 1] = True
+
+    mutants = rng.random(pop_size) < mutpb
+    pop[mutants] ^= rng.random((int(mutants.sum()), genome_size)) < indpb
+    return invalid | mutants
+
+
+def _repair_genomes(genomes: np.ndarray, genome_costs: np.ndarray, max_cost: float, repair_order: np.ndarray):
+    """
+    Repairs the over budget genomes in place- the bought features are dropped according to the repair order until the
+    genome fits the budget.
+    :param genomes: boolean matrix of shape (genomes number, genome length).
+    :param genome_costs: the cost of each genome's position.
+    :param max_cost: the limit of all the bought features cost.
+    :param repair_order: the positions of the bought features, from the first to drop to the last.
+    """
+    excess = genomes @ genome_costs - max_cost
+    over_budget = np.flatnonzero(excess > 0)
+    if not len(over_budget) or not len(repair_order):
+        return
+    ordered = genomes[np.ix_(over_budget, repair_order)]
+    ordered_costs = ordered * genome_costs[repair_order]
+    # a feature is dropped if the features before it in the order do not cover the excess yet
+    dropped = ordered & (np.cumsum(ordered_costs, axis=1) - ordered_costs < excess[over_budget, None])
+    genomes[np.ix_(over_budget, repair_order)] = ordered & ~dropped
+
+
+def _update_hof(hof: dict, genomes: np.ndarray, fitness: np.ndarray):
+    """
+    Adds the genomes to the hall of fame, which is a dictionary from the genome's bitmask to the genome and its fitness.
+    :param hof: the hall of fame.
+    :param genomes: boolean matrix of genomes.
+    :param fitness: the fitness of each genome.
+    """
+    for individual, fit in zip(genomes, fitness):
+        hof.setdefault(get_features_mask(np.flatnonzero(individual)), (individual.copy(), fit))
+
+
+def _evolve_island(pop: np.ndarray, fitness: Optional[np.ndarray], rng: np.random.Generator, generations: int,
+                   parameters: Tuple[float, float, float, int],
+                   budget: Tuple[np.ndarray, float, Optional[np.ndarray]]) -> tuple:
+    """
+    Evolves one island of the island model in the current worker process.
+    :param pop: boolean matrix of shape (population, genome length).
+    :param fitness: the fitness of each individual. if None, the population is evaluated first.
+    :param rng: the random generator of the island.
+    :param generations: the number of generations to evolve.
+    :param parameters: tuple of cxpb, mutpb, indpb and tournsize.
+    :param budget: tuple of the cost of each genome's position, the limit of all the bought features cost, and the
+        order of the positions that are dropped by the repair (if None, the genomes are not repaired) of the query.
+    :return: tuple of the evolved population, its fitness, the random generator and the hall of fame of the evolution.
+    """
+    cxpb, mutpb, indpb, tournsize = parameters
+    genome_costs, max_cost, repair_order = budget
+    hof = {}
+    if fitness is None:
+        fitness = _evaluate_in_worker(TEST_SPLIT, pop, genome_costs, max_cost)
+        _update_hof(hof, pop, fitness)
+    for _ in range(generations):
+        chosen = _select_tournament(rng, fitness, tournsize)
+        pop, fitness = pop[chosen], fitness[chosen]
+        invalid = _vary(rng, pop, cxpb, mutpb, indpb)
+        if repair_order is not None:
+            _repair_genomes(pop, genome_costs, max_cost, repair_order)
+        fitness[invalid] = _evaluate_in_worker(TEST_SPLIT, pop[invalid], genome_costs, max_cost)
+        _update_hof(hof, pop[invalid], fitness[invalid])
+    return pop, fitness, rng, hof
+
+
 """"""""""""""""""""""""""""""""""""""""""" Classes """""""""""""""""""""""""""""""""""""""""""
 
 
@@ -19,11 +299,85 @@ class GeneticAlgorithm(SequenceAlgorithm):
     in case of there isn't a valid solution, a ValueError will be thrown.
     """
 
-    def __init__(self, classifier: sklearn.base.ClassifierMixin, considered_feature_num: Optional[int] = None, random_state: Optional[int] = 42):
-        super().__init__(classifier)
-        self._all_features = considered_feature_num
+    def __init__(self, classifier: sklearn.base.ClassifierMixin, considered_feature_num: Optional[int] = None, random_state: Optional[int] = 42,
+                 fitness_cache_size: Optional[int] = 4096, n_jobs: Optional[int] = None, engine: str = DEAP_ENGINE,
+                 n_islands: Optional[int] = None, migration_interval: int = 2, migration_size: int = 5, repair: bool = True,
+                 fidelity_schedule: Optional[List[float]] = None, fidelity_top_fraction: float = 0.25, fidelity_tolerance: float = 0.02,
+                 objective: str = ACCURACY_OBJECTIVE, validation_top_k: Optional[int] = None,
+                 model_cache_size: Optional[int] = 16,
+                 plan_cache_size: Optional[int] = 1024, plan_cache_path: Optional[str] = None):
+        """
+        Init function for GeneticAlgorithm algorithm.
+        :param classifier: sklearn's classifier. the function saves it and uses it later.
+        :param considered_feature_num: the number of the first features that the genomes are built from. if None, all
+            the features are considered.
+        :param random_state: controls the splits of the train samples.
+        :param fitness_cache_size: the maximal number of the genomes' accuracies that are kept between evaluations. the
+            cache is kept across generations and across predictions, and is cleared on fit. if None, the cache is unbounded.
+        :param n_jobs: the number of worker processes that evaluate the genomes. if None or 1, the genomes are evaluated
+            in the current process. if -1, all the processors are used. the results are identical to the serial run.
+            the workers are started by fit, and are kept until the next fit or close.
+        :param engine: DEAP_ENGINE evolves DEAP's individuals with DEAP's operators. NUMPY_ENGINE keeps the population as
+            one boolean matrix and runs the selection, crossover, mutation and legality checks as batched array operations.
+        :param n_islands: (optional) the number of islands of the island model. if given, the population is divided
+            between the islands, which evolve in separate processes (n_jobs processes, or a process per island) with the
+            array operators of NUMPY_ENGINE, and exchange their best individuals.
+        :param migration_interval: the number of generations between the migrations of the island model.
+        :param migration_size: the number of individuals that each island sends to the next island in every migration.
+        :param repair: if True, the population is initialized according to the budget and every over budget genome is
+            repaired by dropping the bought features with the worst cost per value until it fits the budget, so all
+            the evaluations are spent on legal genomes.
+        :param fidelity_schedule: (optional) multi-fidelity evaluation- the fraction of the train data that the genomes
+            of each generation are first scored on (the last fraction is used for the rest of the generations). only
+            the top fraction of the legal genomes is re-scored on the whole data. applies to DEAP_ENGINE and NUMPY_ENGINE,
+            with the accuracy objective and without islands.
+        :param fidelity_top_fraction: the fraction of the legal genomes that are re-scored on the whole data.
+        :param fidelity_tolerance: if the mean difference between the partial and the full scores of the re-scored
+            genomes exceeds the tolerance, the rest of the run is scored on the whole data.
+        :param objective: ACCURACY_OBJECTIVE runs the genetic algorithm for every query with the query's budget.
+            PARETO_OBJECTIVE evolves once per given features, with DEAP's NSGA-II, the pareto front of the subsets'
+            (validation accuracy, cost), and answers every budget from the front. requires DEAP_ENGINE without islands.
+        :param validation_top_k: (optional) the number of the hall of fame's best distinct legal genomes (by test
+            accuracy) that are re-ranked on the validation data. the scan stops once k legal genomes are found.
+            None means all of them.
+        :param model_cache_size: the maximal number of fitted classifiers that are kept, one per bought subset of
+            features.
+        :param plan_cache_size: the maximal number of bought subsets that are kept, one per query.
+        :param plan_cache_path: (optional) a file that the bought subsets are saved to and loaded from.
+        """
+        if engine not in (DEAP_ENGINE, NUMPY_ENGINE):
+            raise ValueError(f"Unknown engine {engine}")
+        if objective not in (ACCURACY_OBJECTIVE, PARETO_OBJECTIVE):
+            raise ValueError(f"Unknown objective {objective}")
+        if objective == PARETO_OBJECTIVE and (engine != DEAP_ENGINE or n_islands):
+            raise ValueError("The pareto objective requires DEAP_ENGINE without islands")
+        if fidelity_schedule and (objective == PARETO_OBJECTIVE or n_islands):
+            raise ValueError("The fidelity schedule requires the accuracy objective without islands")
+        super().__init__(classifier, model_cache_size, plan_cache_size, plan_cache_path)
+        self._considered_feature_num = considered_feature_num
+        self._all_features = None
         self._max_cost = None
         self._given_features = None
+        self._fitness_cache = LRUCache(fitness_cache_size)
+        self._fitness_cache_size = fitness_cache_size
+        self._scorer = None
+        self._n_jobs = os.cpu_count() if n_jobs == -1 else n_jobs
+        self._engine = engine
+        self._n_islands = n_islands
+        self._migration_interval = migration_interval
+        self._migration_size = migration_size
+        self._repair = repair
+        self._fidelity_schedule = fidelity_schedule
+        self._fidelity_top_fraction = fidelity_top_fraction
+        self._fidelity_tolerance = fidelity_tolerance
+        self._full_fidelity_only = False
+        self._objective = objective
+        self._validation_top_k = validation_top_k
+        self._pareto_fronts = {}
+        self._features_values = None
+        self._repair_order = None
+        self._genome_costs = None
+        self._executor = None
 
         # parameters for the algorithm
         self._random_state = random_state
@@ -31,6 +385,10 @@ class GeneticAlgorithm(SequenceAlgorithm):
         self._max_iter = 400
         self._num_pop = 50
         self._num_gen = 8
+        self._cxpb = 0.5
+        self._mutpb = 0.2
+        self._indpb = 0.05
+        self._tournsize = 3
 
     def fit(self, train_samples: TrainSamples, features_costs: list[float]):
         """
@@ -40,9 +398,44 @@ class GeneticAlgorithm(SequenceAlgorithm):
         :param features_costs: list in length number of features that contains the costs of each feature according to
         indices. in first index you will find the cost of the first feature, etc. the function saves it.
         """
-        self._train_samples = train_samples
-        self._features_costs = features_costs
-        self._all_features = [i for i in range(train_samples.get_features_num() if self._all_features is None else self._all_features)]
+        super().fit(train_samples, features_costs)
+        self._all_features = [i for i in range(train_samples.get_features_num() if self._considered_feature_num is None else self._considered_feature_num)]
+
+        X_trainAndTest, X_validation, y_trainAndTest, y_validation = train_test_split(train_samples.samples,
+                                                                                      train_samples.classes,
+                                                                                      test_size=self._test_size,
+                                                                                      random_state=self._random_state)
+        X_train, X_test, y_train, y_test = train_test_split(X_trainAndTest, y_trainAndTest, test_size=self._test_size,
+                                                            random_state=self._random_state)
+        self._scorer = GenomeScorer({TEST_SPLIT: (X_train, X_test, y_train, y_test),
+                                     VALIDATION_SPLIT: (X_trainAndTest, X_validation, y_trainAndTest, y_validation)},
+                                    self._max_iter, self._fidelity_schedule or (), self._random_state)
+        self._features_values = self._scorer.get_features_values(TEST_SPLIT)[:len(self._all_features)]
+        self._fitness_cache.clear()
+        self._pareto_fronts.clear()
+        self.close()
+        if self._get_workers_num():
+            self._executor = ProcessPoolExecutor(max_workers=self._get_workers_num(), initializer=_init_worker,
+                                                 initargs=(self._scorer, self._fitness_cache_size))
+
+    def close(self):
+        """
+        Shuts down the worker processes, if there are any.
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def get_params(self) -> dict:
+        parameters = super().get_params()
+        parameters.update(considered_feature_num=self._considered_feature_num, random_state=self._random_state,
+                          engine=self._engine, n_islands=self._n_islands, migration_interval=self._migration_interval,
+                          migration_size=self._migration_size, repair=self._repair, fidelity_schedule=self._fidelity_schedule,
+                          fidelity_top_fraction=self._fidelity_top_fraction, fidelity_tolerance=self._fidelity_tolerance,
+                          objective=self._objective, validation_top_k=self._validation_top_k, test_size=self._test_size,
+                          max_iter=self._max_iter, num_pop=self._num_pop, num_gen=self._num_gen, cxpb=self._cxpb,
+                          mutpb=self._mutpb, indpb=self._indpb, tournsize=self._tournsize)
+        return parameters
 
     def _buy_features(self, given_features: GivenFeatures, maximal_cost: float) -> GivenFeatures:
         """
@@ -52,53 +445,215 @@ class GeneticAlgorithm(SequenceAlgorithm):
         :param maximal_cost: the limit of all the bought features cost
         :return: a valid subset of the features
         """
-        self._max_cost = maximal_cost
-        self._given_features = given_features
+        if self._objective == PARETO_OBJECTIVE:
+            return self._get_pareto_subset(given_features, maximal_cost)
+
+        self._set_budget(given_features, maximal_cost)
 
         max_val_subsets = self._get_max_val_subsets()
         valid = self._get_valid_subset(max_val_subsets)
         return valid
 
+    def _set_budget(self, given_features: GivenFeatures, maximal_cost: float):
+        """
+        saves the query's parameters, and the cost vector of the genome's positions- the given features are free.
+        :param given_features: the features that are given to us for free
+        :param maximal_cost: the limit of all the bought features cost
+        """
+        self._max_cost = maximal_cost
+        self._given_features = given_features
+        self._genome_costs = np.array([0 if feature in given_features else self._features_costs[feature] for feature in self._all_features], dtype=float)
+
+        # the bought features are dropped from the worst cost per value to the best
+        bought_positions = np.flatnonzero(self._genome_costs > 0)
+        cost_per_value = self._genome_costs[bought_positions] / (self._features_values[bought_positions] + 1e-12)
+        self._repair_order = bought_positions[np.argsort(-cost_per_value, kind="stable")] if self._repair else None
+
     def _get_max_val_subsets(self) -> List[List[int]]:
         """
         the genetic algorithm. return the HallOfFame - the best feature's subsets it terms of accuracy
         :return: HOF
         """
-        X_trainAndTest, X_validation, y_trainAndTest, y_validation = train_test_split(self._train_samples.samples,
-                                                                                      self._train_samples.classes,
-                                                                                      test_size=self._test_size,
-                                                                                      random_state=self._random_state)
-        X_train, X_test, y_train, y_test = train_test_split(X_trainAndTest, y_trainAndTest, test_size=self._test_size,
-                                                            random_state=self._random_state)
+        random.seed(self._random_state)
+        self._full_fidelity_only = False
+        toolbox = self._get_toolbox(self._executor)
+        if self._n_islands:
+            hof = self._get_HOF_islands(self._executor)
+        else:
+            hof = self._get_HOF(toolbox) if self._engine == DEAP_ENGINE else self._get_HOF_numpy(toolbox)
+        testAccuracyList, validationAccuracyList, individualList, percentileList = self._get_metrics(hof, toolbox)
+
+        # Get a list of subsets that performed best on validation data
+        maxValAccuracy = max(validationAccuracyList, default=None)
+        maxValIndividuals = [individual for individual, validationAccuracy in zip(individualList, validationAccuracyList)
+                             if validationAccuracy == maxValAccuracy]
+        maxValSubsets = [self._get_genome_subset(individual) for individual in maxValIndividuals]
+
+        return maxValSubsets
 
-        creator.create("FitnessMax", base.Fitness, weights=(1.0,))
-        creator.create("Individual", list, fitness=creator.FitnessMax)
+    def _get_pareto_subset(self, given_features: GivenFeatures, maximal_cost: float) -> List[int]:
+        """
+        returns the subset of the pareto front with the best validation accuracy among the subsets under the budget.
+        the front is evolved once per given features, and is kept until the next fit.
+        :param given_features: the features that are given to us for free
+        :param maximal_cost: the limit of all the bought features cost
+        :return: a valid subset of the features
+        """
+        key = frozenset(given_features)
+        if key not in self._pareto_fronts:
+            self._pareto_fronts[key] = self._get_pareto_front(given_features)
+        costs, subsets = self._pareto_fronts[key]
+        if maximal_cost < costs[0]:
+            raise ValueError("No Valid Solution")
+        # the front is sorted by the cost, and its accuracy increases with the cost
+        return list(subsets[bisect.bisect_right(costs, maximal_cost) - 1])
+
+    def _get_pareto_front(self, given_features: GivenFeatures) -> Tuple[List[float], List[List[int]]]:
+        """
+        evolves the pareto front of (accuracy, cost) with NSGA-II, without a budget. the first front of the final
+        population is re-ranked by the validation accuracy, with the subset of the given features only, which is free.
+        :param given_features: the features that are given to us for free
+        :return: tuple of the costs and the subsets of the front, sorted by the cost.
+        """
+        self._set_budget(given_features, np.inf)
+        random.seed(self._random_state)
+        if not hasattr(creator, "FitnessPareto"):
+            creator.create("FitnessPareto", base.Fitness, weights=(1.0, -1.0))
+        if not hasattr(creator, "ParetoIndividual"):
+            creator.create("ParetoIndividual", list, fitness=creator.FitnessPareto)
+
+        toolbox = self._get_toolbox(self._executor)
+        toolbox.register("individual", tools.initRepeat, creator.ParetoIndividual, toolbox.attr_bool, len(self._all_features))
+        toolbox.register("population", tools.initRepeat, list, toolbox.individual)
+        toolbox.register("select", tools.selNSGA2)
+
+        pop_size = self._num_pop * self._num_gen
+        pop = toolbox.population(pop_size)
+        self._evaluate_pareto_population(pop, toolbox)
+        pop = toolbox.select(pop, pop_size)
+        for _ in range(self._num_gen):
+            offspring = algorithms.varAnd(pop, toolbox, cxpb=self._cxpb, mutpb=self._mutpb)
+            self._evaluate_pareto_population(offspring, toolbox)
+            pop = toolbox.select(pop + offspring, pop_size)
+
+        front = tools.sortNondominated(pop, len(pop), first_front_only=True)[0]
+        empty_genome = [int(feature in given_features) for feature in self._all_features]
+        genomes = list({get_features_mask(np.flatnonzero(individual)): individual for individual in front + [empty_genome]}.values())
+        validation = self._get_fitnesses(genomes, VALIDATION_SPLIT, toolbox)
+
+        # the members of the front that are not dominated on the validation data, from the cheapest
+        members = sorted((float(np.asarray(individual, dtype=bool) @ self._genome_costs), -fit[0], index)
+                         for index, (individual, fit) in enumerate(zip(genomes, validation)))
+        costs, subsets, best_accuracy = [], [], -np.inf
+        for cost, negative_accuracy, index in members:
+            if -negative_accuracy > best_accuracy:
+                best_accuracy = -negative_accuracy
+                costs.append(cost)
+                subsets.append(self._get_genome_subset(genomes[index]))
+        return costs, subsets
+
+    def _evaluate_pareto_population(self, population: list, toolbox: base.Toolbox):
+        """
+        sets the (accuracy, cost) fitness of the individuals which their fitness is invalid.
+        :param population: list of individuals.
+        :param toolbox: the toolbox of the genetic algorithm.
+        """
+        invalid_ind = [ind for ind in population if not ind.fitness.valid]
+        costs = np.asarray(invalid_ind, dtype=bool).reshape(len(invalid_ind), len(self._all_features)) @ self._genome_costs
+        for ind, fit, cost in zip(invalid_ind, self._get_fitnesses(invalid_ind, TEST_SPLIT, toolbox), costs):
+            ind.fitness.values = (fit[0], cost)
+
+    def _get_workers_num(self) -> int:
+        """
+        :return: the number of worker processes- n_jobs, or a process per island in the island model. 0 means that the
+            genomes are evaluated in the current process.
+        """
+        if self._n_jobs is not None and self._n_jobs > 1:
+            return self._n_jobs
+        return self._n_islands or 0
+
+    def _get_toolbox(self, executor: Optional[ProcessPoolExecutor] = None) -> base.Toolbox:
+        """
+        returns DEAP's toolbox for the genetic algorithm.
+        :param executor: (optional) process pool. if given, its map is registered on the toolbox and the genomes are
+            scored in its workers.
+        :return: toolbox.
+        """
+        # DEAP's creator classes are global, so they are created once per process
+        if not hasattr(creator, "FitnessMax"):
+            creator.create("FitnessMax", base.Fitness, weights=(1.0,))
+        if not hasattr(creator, "Individual"):
+            creator.create("Individual", list, fitness=creator.FitnessMax)
 
         toolbox = base.Toolbox()
         toolbox.register("attr_bool", random.randint, 0, 1)
         toolbox.register("individual", tools.initRepeat, creator.Individual, toolbox.attr_bool, len(self._all_features))
         toolbox.register("population", tools.initRepeat, list, toolbox.individual)
 
-        toolbox.register("evaluate", self._get_fitness, X_train=X_train, X_test=X_test, y_train=y_train, y_test=y_test)
         toolbox.register("mate", tools.cxOnePoint)
-        toolbox.register("mutate", tools.mutFlipBit, indpb=0.05)
-        toolbox.register("select", tools.selTournament, tournsize=3)
-
-        hof = self._get_HOF(toolbox)
-        testAccuracyList, validationAccuracyList, individualList, percentileList = self._get_metrics(hof,
-                                                                                                     X_trainAndTest,
-                                                                                                     X_validation,
-                                                                                                     y_trainAndTest,
-                                                                                                     y_validation)
+        toolbox.register("mutate", tools.mutFlipBit, indpb=self._indpb)
+        toolbox.register("select", tools.selTournament, tournsize=self._tournsize)
+
+        if self._repair_order is not None:
+            toolbox.register("individual", tools.initIterate, creator.Individual, self._get_random_genome)
+            toolbox.register("population", tools.initRepeat, list, toolbox.individual)
+            toolbox.decorate("population", self._repair_decorator)
+            toolbox.decorate("mate", self._repair_decorator)
+            toolbox.decorate("mutate", self._repair_decorator)
+
+        if executor is None:
+            toolbox.register("score", self._scorer.score)
+        else:
+            chunksize = max(1, self._num_pop * self._num_gen // (4 * self._get_workers_num()))
+            toolbox.register("map", executor.map, chunksize=chunksize)
+            toolbox.register("score", _score_in_worker)
+        return toolbox
+
+    def _get_inclusion_probabilities(self) -> np.ndarray:
+        """
+        the cost-aware initialization- a bought feature is included with a probability that makes the expected cost
+        of a random genome fit the budget, and the free features are included with probability 0.5.
+        :return: array of the inclusion probability of each genome's position.
+        """
+        total_cost = self._genome_costs.sum()
+        bought_probability = min(0.5, self._max_cost / total_cost) if total_cost > 0 else 0.5
+        return np.where(self._genome_costs > 0, bought_probability, 0.5)
 
-        # Get a list of subsets that performed best on validation data
-        maxValAccSubsetIndices = [index for index in range(len(validationAccuracyList)) if
-                                  validationAccuracyList[index] == max(validationAccuracyList)]
-        maxValIndividuals = [individualList[index] for index in maxValAccSubsetIndices]
-        maxValSubsets = [[self._all_features[index] for index in range(len(individual)) if individual[index] == 1] for
-                         individual in maxValIndividuals]
+    def _get_random_genome(self) -> Genome:
+        """
+        :return: random genome according to the cost-aware initialization, drawn with python's random as DEAP does.
+        """
+        return [int(random.random() < probability) for probability in self._get_inclusion_probabilities()]
 
-        return maxValSubsets
+    def _repair_decorator(self, function: Callable) -> Callable:
+        """
+        decorator for DEAP's operators- repairs the individuals that the operator returns.
+        :param function: DEAP's operator which returns a sequence of individuals.
+        :return: the decorated operator.
+        """
+        def wrapper(*args, **kwargs):
+            individuals = function(*args, **kwargs)
+            genomes = np.asarray(individuals, dtype=bool).reshape(len(individuals), len(self._all_features))
+            _repair_genomes(genomes, self._genome_costs, self._max_cost, self._repair_order)
+            for individual, genome in zip(individuals, genomes):
+                individual[:] = genome.astype(int).tolist()
+            return individuals
+        return wrapper
+
+    def _get_random_genomes(self, rng: np.random.Generator, genomes_num: int) -> np.ndarray:
+        """
+        random genomes for NUMPY_ENGINE and the island model. in case of repair, the genomes are drawn according to the
+        cost-aware initialization and repaired.
+        :param rng: random generator.
+        :param genomes_num: the number of genomes.
+        :return: boolean matrix of shape (genomes_num, genome length).
+        """
+        genome_size = len(self._all_features)
+        if self._repair_order is None:
+            return rng.integers(0, 2, size=(genomes_num, genome_size), dtype=np.uint8).astype(bool)
+        genomes = rng.random((genomes_num, genome_size)) < self._get_inclusion_probabilities()
+        _repair_genomes(genomes, self._genome_costs, self._max_cost, self._repair_order)
+        return genomes
 
     def _get_valid_subset(self, subsets: List[List[int]]) -> List[int]:
         """
@@ -137,41 +692,103 @@ class GeneticAlgorithm(SequenceAlgorithm):
             return False
         return True
 
-    def _get_fitness(self, individual: List[int], X_train, X_test, y_train, y_test) -> (float,):
+    def _get_legal_genomes(self, genomes: np.ndarray) -> np.ndarray:
+        """
+        this function determine rather each genome is legal in terms of cost.
+        :param genomes: boolean matrix of shape (genomes number, genome length).
+        :return: boolean array of the legality of each genome.
+        """
+        return genomes @ self._genome_costs <= self._max_cost
+
+    def _get_genome_subset(self, individual: Genome) -> List[int]:
+        """
+        this function translate a genome to the subset of features it represents
+        :param individual: genome.
+        :return: subset of features.
+        """
+        return [self._all_features[index] for index in range(len(individual)) if individual[index] == 1]
+
+    def _get_fitness(self, individual: Genome, split: str) -> (float,):
         """
         the fitness function for the genetic algorithm.
         :param individual: genome.
+        :param split: the key of the split that the genome is scored on.
         :return: accuracy
         """
+        return self._get_fitnesses([individual], split)[0]
+
+    def _get_fitnesses(self, individuals: List[Genome], split: str, toolbox: Optional[base.Toolbox] = None,
+                       fidelity: float = FULL_FIDELITY) -> List[Tuple[float]]:
+        """
+        the fitness function for a batch of genomes. the accuracies are cached according to the genome's bitmask and
+        the split it was scored on, and the accuracies that are not cached are computed with the toolbox's map.
+        :param individuals: genomes.
+        :param split: the key of the split that the genomes are scored on.
+        :param toolbox: (optional) toolbox that its map and score are used for the missing accuracies. if None, the
+            accuracies are computed in the current process.
+        :param fidelity: the fraction of the train data of the split that the genomes are scored on.
+        :return: list of fitnesses according to the genomes order.
+        """
+        map_function, score = (map, self._scorer.score) if toolbox is None else (toolbox.map, toolbox.score)
 
         # accuracy is between 0 to 1, scoring a subset with -1 when the initial population is legal
         # promise that this subset won't chosen
-
-        if not self._is_legal_subset(individual):
-            return -1
-
-        x_train_data = pd.DataFrame(X_train)
-        x_test_data = pd.DataFrame(X_test)
-
-        unwanted_cols = [index for index in range(len(individual)) if individual[index] == 0]
-        X_trainParsed = x_train_data.drop(x_train_data.columns[unwanted_cols], axis=1)
-        X_trainOhFeatures = pd.get_dummies(X_trainParsed)
-        X_testParsed = x_test_data.drop(x_test_data.columns[unwanted_cols], axis=1)
-        X_testOhFeatures = pd.get_dummies(X_testParsed)
-
-        sharedFeatures = set(X_trainOhFeatures.columns) & set(X_testOhFeatures.columns)
-        removeFromTrain = set(X_trainOhFeatures.columns) - sharedFeatures
-        removeFromTest = set(X_testOhFeatures.columns) - sharedFeatures
-        X_trainOhFeatures = X_trainOhFeatures.drop(list(removeFromTrain), axis=1)
-        X_testOhFeatures = X_testOhFeatures.drop(list(removeFromTest), axis=1)
-
-        clf = LogisticRegression(max_iter=self._max_iter)
-        clf.fit(X_trainOhFeatures, y_train)
-        predictions = clf.predict(X_testOhFeatures)
-        accuracy = accuracy_score(y_test, predictions)
+        keys, genomes = [], {}
+        genomes_matrix = np.asarray(individuals, dtype=bool).reshape(len(individuals), len(self._all_features))
+        for individual, is_legal in zip(genomes_matrix, self._get_legal_genomes(genomes_matrix)):
+            key = None
+            if is_legal:
+                key = (split, fidelity, get_features_mask(np.flatnonzero(individual)))
+                genomes[key] = individual
+            keys.append(key)
+
+        accuracies = {key: self._fitness_cache.get(key) for key in genomes}
+        missing = [key for key, accuracy in accuracies.items() if accuracy is None]
+        for key, accuracy in zip(missing, map_function(score, [split] * len(missing), [genomes[key] for key in missing], [fidelity] * len(missing))):
+            accuracies[key] = accuracy
+            self._fitness_cache.put(key, accuracy)
 
         # Return calculated accuracy as fitness
-        return accuracy,
+        return [(-1,) if key is None else (accuracies[key],) for key in keys]
+
+    def _get_generation_fitnesses(self, individuals: List[Genome], toolbox: base.Toolbox, generation: int) -> List[Tuple[float]]:
+        """
+        the fitness function of the evolution. in case of multi-fidelity evaluation, the genomes are scored on the
+        generation's fraction of the train data, and only the top fraction of the legal genomes is re-scored on the
+        whole data. the rest of the genomes keep their partial scores.
+        :param individuals: genomes.
+        :param toolbox: the toolbox of the genetic algorithm.
+        :param generation: the index of the generation.
+        :return: list of fitnesses according to the genomes order.
+        """
+        fidelity = FULL_FIDELITY
+        if self._fidelity_schedule and not self._full_fidelity_only:
+            fidelity = self._fidelity_schedule[min(generation, len(self._fidelity_schedule) - 1)]
+        if fidelity >= FULL_FIDELITY:
+            return self._get_fitnesses(individuals, TEST_SPLIT, toolbox)
+
+        fitnesses = self._get_fitnesses(individuals, TEST_SPLIT, toolbox, fidelity)
+        legal = [index for index in range(len(fitnesses)) if fitnesses[index][0] >= 0]
+        survivors = sorted(legal, key=lambda index: fitnesses[index][0], reverse=True)[:int(np.ceil(self._fidelity_top_fraction * len(legal)))]
+        full_fitnesses = self._get_fitnesses([individuals[index] for index in survivors], TEST_SPLIT, toolbox)
+        if len(survivors) and np.mean([abs(fitnesses[index][0] - fit[0]) for index, fit in zip(survivors, full_fitnesses)]) > self._fidelity_tolerance:
+            self._full_fidelity_only = True
+        for index, fit in zip(survivors, full_fitnesses):
+            fitnesses[index] = fit
+        return fitnesses
+
+    def _evaluate_population(self, population: list, toolbox: base.Toolbox, generation: int = 0):
+        """
+        sets the fitness of the individuals which their fitness is invalid.
+        :param population: list of individuals.
+        :param toolbox: the toolbox of the genetic algorithm.
+        :param generation: the index of the generation.
+        :return: the number of the evaluated individuals.
+        """
+        invalid_ind = [ind for ind in population if not ind.fitness.valid]
+        for ind, fit in zip(invalid_ind, self._get_generation_fitnesses(invalid_ind, toolbox, generation)):
+            ind.fitness.values = fit
+        return len(invalid_ind)
 
     def _get_HOF(self, toolbox):
         """
@@ -187,28 +804,138 @@ class GeneticAlgorithm(SequenceAlgorithm):
         stats.register("min", np.min)
         stats.register("max", np.max)
 
-        # Launch genetic algorithm
-        pop, log = algorithms.eaSimple(pop, toolbox, cxpb=0.5, mutpb=0.2, ngen=self._num_gen, stats=stats, halloffame=hof,
-                                       verbose=True)
+        # Launch genetic algorithm- the same generational process as DEAP's eaSimple, with batched evaluations
+        logbook = tools.Logbook()
+        logbook.header = ['gen', 'nevals'] + stats.fields
+        nevals = self._evaluate_population(pop, toolbox)
+        hof.update(pop)
+        logbook.record(gen=0, nevals=nevals, **stats.compile(pop))
+        print(logbook.stream)
+
+        for gen in range(1, self._num_gen + 1):
+            offspring = toolbox.select(pop, len(pop))
+            offspring = algorithms.varAnd(offspring, toolbox, cxpb=self._cxpb, mutpb=self._mutpb)
+            nevals = self._evaluate_population(offspring, toolbox, gen)
+            hof.update(offspring)
+            pop[:] = offspring
+            logbook.record(gen=gen, nevals=nevals, **stats.compile(pop))
+            print(logbook.stream)
 
         # Return the hall of fame
-        return hof
+        return [(individual, individual.fitness.values[0]) for individual in hof]
+
+    def _get_HOF_numpy(self, toolbox):
+        """
+        the same generational process as _get_HOF, where the population is a boolean matrix of shape (population,
+        genome length) and the genetic operators are batched array operations.
+        :param toolbox: the toolbox of the genetic algorithm, used for the genomes evaluation.
+        :return: HOF- list of the best genomes and their fitness, from the best to the worst.
+        """
+        rng = np.random.default_rng(self._random_state)
+        pop_size = self._num_pop * self._num_gen
+        pop = self._get_random_genomes(rng, pop_size)
+        fitness = np.array([fit[0] for fit in self._get_generation_fitnesses(pop, toolbox, 0)])
+        hof = {}
+        _update_hof(hof, pop, fitness)
+        logbook = tools.Logbook()
+        logbook.header = ['gen', 'nevals', 'avg', 'std', 'min', 'max']
+        logbook.record(gen=0, nevals=pop_size, avg=fitness.mean(), std=fitness.std(), min=fitness.min(), max=fitness.max())
+        print(logbook.stream)
+
+        for gen in range(1, self._num_gen + 1):
+            chosen = _select_tournament(rng, fitness, self._tournsize)
+            pop, fitness = pop[chosen], fitness[chosen]
+            invalid = _vary(rng, pop, self._cxpb, self._mutpb, self._indpb)
+            if self._repair_order is not None:
+                _repair_genomes(pop, self._genome_costs, self._max_cost, self._repair_order)
+            fitness[invalid] = [fit[0] for fit in self._get_generation_fitnesses(pop[invalid], toolbox, gen)]
+            _update_hof(hof, pop[invalid], fitness[invalid])
+            logbook.record(gen=gen, nevals=int(invalid.sum()), avg=fitness.mean(), std=fitness.std(), min=fitness.min(), max=fitness.max())
+            print(logbook.stream)
+
+        best = sorted(hof.values(), key=lambda item: item[1], reverse=True)
+        return best[:pop_size]
+
+    def _get_HOF_islands(self, executor: ProcessPoolExecutor):
+        """
+        the island model- the population is divided to sub-populations which evolve independently in the workers of
+        the process pool, with the array operators of NUMPY_ENGINE. every migration interval the best individuals of
+        each island replace the worst individuals of the next island (ring topology).
+        :param executor: the process pool of the islands.
+        :return: HOF- list of the best genomes of all the islands and their fitness, from the best to the worst.
+        """
+        pop_size = self._num_pop * self._num_gen
+        island_size = max(pop_size // self._n_islands, 2)
+        rngs = [np.random.default_rng(seed) for seed in np.random.SeedSequence(self._random_state).spawn(self._n_islands)]
+        islands = [(self._get_random_genomes(rng, island_size), None, rng) for rng in rngs]
+        parameters = (self._cxpb, self._mutpb, self._indpb, self._tournsize)
+        budget = (self._genome_costs, self._max_cost, self._repair_order)
+        migration_size = min(self._migration_size, island_size // 2)
+        hof, gen = {}, 0
+        logbook = tools.Logbook()
+        logbook.header = ['gen', 'avg', 'std', 'min', 'max']
+
+        while gen < self._num_gen:
+            generations = min(self._migration_interval, self._num_gen - gen)
+            futures = [executor.submit(_evolve_island, pop, fitness, rng, generations, parameters, budget) for pop, fitness, rng in islands]
+            results = [future.result() for future in futures]
+            gen += generations
+            for _, _, _, island_hof in results:
+                for mask, (individual, fit) in island_hof.items():
+                    hof.setdefault(mask, (individual, fit))
+
+            # ring migration- the emigrants are chosen before any island is changed
+            emigrants = [np.argsort(-fitness, kind="stable")[:migration_size] for _, fitness, _, _ in results]
+            islands = []
+            for index, (pop, fitness, rng, _) in enumerate(results):
+                source_pop, source_fitness, _, _ = results[index - 1]
+                worst = np.argsort(fitness, kind="stable")[:migration_size]
+                pop, fitness = pop.copy(), fitness.copy()
+                pop[worst], fitness[worst] = source_pop[emigrants[index - 1]], source_fitness[emigrants[index - 1]]
+                islands.append((pop, fitness, rng))
+
+            all_fitness = np.concatenate([fitness for _, fitness, _ in islands])
+            logbook.record(gen=gen, avg=all_fitness.mean(), std=all_fitness.std(), min=all_fitness.min(), max=all_fitness.max())
+            print(logbook.stream)
+
+        # the islands' accuracies are kept for the next queries
+        for mask, (_, fit) in hof.items():
+            if fit >= 0:
+                self._fitness_cache.put((TEST_SPLIT, FULL_FIDELITY, mask), fit)
+        best = sorted(hof.values(), key=lambda item: item[1], reverse=True)
+        return best[:pop_size]
+
+    def _get_validation_candidates(self, hof) -> List[tuple]:
+        """
+        this function filters the hall of fame to the genomes that are worth a validation fit- duplicates and illegal
+        genomes are dropped, and the scan stops once validation_top_k legal genomes are found.
+        :param hof: list of (genome, test accuracy) pairs, sorted by descending test accuracy.
+        :return: list of (genome, test accuracy) pairs.
+        """
+        if not hof:
+            return []
+        legal = self._get_legal_genomes(np.array([individual for individual, _ in hof], dtype=float))
+        candidates = []
+        seen = set()
+        for (individual, testAccuracy), isLegal in zip(hof, legal):
+            if self._validation_top_k is not None and len(candidates) >= self._validation_top_k:
+                break
+            mask = get_features_mask(np.flatnonzero(individual))
+            if not isLegal or mask in seen:
+                continue
+            seen.add(mask)
+            candidates.append((individual, testAccuracy))
+        return candidates
+
+    def _get_metrics(self, hof, toolbox: Optional[base.Toolbox] = None):
+        candidates = self._get_validation_candidates(hof)
 
-    def _get_metrics(self, hof, X_trainAndTest, X_validation, y_trainAndTest, y_validation):
         # Get list of percentiles in the hall of fame
-        percentileList = [i / (len(hof) - 1) for i in range(len(hof))]
+        percentileList = [i / max(len(candidates) - 1, 1) for i in range(len(candidates))]
 
         # Gather fitness data from each percentile
-        testAccuracyList = []
-        validationAccuracyList = []
-        individualList = []
-        for individual in hof:
-            testAccuracy = individual.fitness.values
-            validationAccuracy = self._get_fitness(individual, X_trainAndTest, X_validation, y_trainAndTest,
-                                                   y_validation)
-            testAccuracyList.append(testAccuracy[0])
-            validationAccuracyList.append(validationAccuracy[0])
-            individualList.append(individual)
-        testAccuracyList.reverse()
-        validationAccuracyList.reverse()
+        testAccuracyList = [testAccuracy for _, testAccuracy in candidates]
+        individualList = [individual for individual, _ in candidates]
+        validationAccuracyList = [validationAccuracy[0] for validationAccuracy in
+                                  self._get_fitnesses(individualList, VALIDATION_SPLIT, toolbox)]
         return testAccuracyList, validationAccuracyList, individualList, percentileList
@@ -0,0 +1,84 @@
+"""
+This module contains a lazy greedy algorithm.
+"""
+
+""""""""""""""""""""""""""""""""""""""""""" Imports """""""""""""""""""""""""""""""""""""""""""
+from General.utils import *
+import heapq
+
+from LearningAlgorithms.abstract_algorithm import SequenceAlgorithm
+from General.score import ScoreFunction
+
+""""""""""""""""""""""""""""""""""""""""""" Classes """""""""""""""""""""""""""""""""""""""""""
+
+
+class LazyGreedyAlgorithm(SequenceAlgorithm):
+    """
+    An algorithm that buys in each stage the feature with the best score (which is per unit of cost), with lazy
+    evaluations (CELF)- the scores are kept in a priority queue, and a score that was calculated before the last
+    purchase is recalculated only when it reaches the top of the queue. for scores with diminishing returns, a stale
+    score is an upper bound of the current one, so the chosen features are the same as the plain greedy's.
+    """
+    def __init__(self, classifier: sklearn.base.ClassifierMixin, score_function: ScoreFunction,
+                 model_cache_size: Optional[int] = 16,
+                 plan_cache_size: Optional[int] = 1024, plan_cache_path: Optional[str] = None):
+        """
+        Init function.
+        :param classifier: sklearn's classifier. the function saves it and uses it later.
+        :param score_function: ScoreFunction object for calculating the score of adding a feature to the given features.
+        :param model_cache_size: the maximal number of fitted classifiers that are kept, one per bought subset of
+            features.
+        :param plan_cache_size: the maximal number of bought subsets that are kept, one per query.
+        :param plan_cache_path: (optional) a file that the bought subsets are saved to and loaded from.
+        """
+        super().__init__(classifier, model_cache_size, plan_cache_size, plan_cache_path)
+        self._score_function = score_function
+        self._evaluations = 0
+
+    def get_params(self) -> dict:
+        parameters = super().get_params()
+        parameters.update(score_function=self._score_function)
+        return parameters
+
+    # Private Methods
+    def _buy_features(self, given_features: GivenFeatures, maximal_cost: float) -> GivenFeatures:
+        """
+        A method for choosing the supplementary features. the method buys the feature with the best score until there
+        isn't an affordable feature with a positive score.
+        :param given_features: list of the indices of the chosen features.
+        :param maximal_cost: the maximum available cost for buying features.
+        :return: the updated given features including all the chosen features.
+        """
+        available_features = sorted(get_complementary_set(range(self._train_samples.get_features_num()), given_features))
+        available_features = [feature for feature in available_features if self._features_costs[feature] <= maximal_cost]
+        scores = self._get_scores(given_features, available_features)
+        queue = [(-score, feature, 0) for score, feature in zip(scores, available_features)]
+        heapq.heapify(queue)
+        purchases = 0
+        while queue:
+            negative_score, chosen_feature, scored_at = heapq.heappop(queue)
+            if self._features_costs[chosen_feature] > maximal_cost:
+                continue
+            if scored_at != purchases:
+                heapq.heappush(queue, (-self._get_scores(given_features, [chosen_feature])[0], chosen_feature, purchases))
+                continue
+            if negative_score >= 0:
+                break
+            maximal_cost -= self._features_costs[chosen_feature]
+            given_features.append(chosen_feature)
+            purchases += 1
+        return given_features
+
+    def _get_scores(self, given_features: GivenFeatures, candidates: List[int]) -> np.ndarray:
+        """
+        Calculates the scores of adding each of the candidates to the given features. undefined (NaN) scores, e.g
+        ScoreFunctionA's without given features, are -inf, so they keep the queue ordered and are never bought.
+        :param given_features: list of the indices of the chosen features.
+        :param candidates: list of the indices of the candidate features.
+        :return: array of the score of each candidate.
+        """
+        if not len(candidates):
+            return np.array([])
+        self._evaluations += len(candidates)
+        scores = self._score_function.score_candidates(self._train_samples, list(given_features), candidates, self._features_costs)
+        return np.where(np.isnan(scores), -np.inf, scores)
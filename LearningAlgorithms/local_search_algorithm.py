@@ -5,7 +5,9 @@ This module contains local search algorithm.
 """"""""""""""""""""""""""""""""""""""""""" Imports """""""""""""""""""""""""""""""""""""""""""
 from General.utils import *
 from simpleai.search import SearchProblem
-from more_itertools import powerset
+from concurrent.futures import Executor, ProcessPoolExecutor
+import bisect
+import itertools
 
 from LearningAlgorithms.abstract_algorithm import SequenceAlgorithm
 from General.score import ScoreFunction
@@ -16,16 +18,81 @@ Node = frozenset[int]
 Edge = Tuple[Node, Node]
 State = GivenFeatures
 
+_worker_score_function: Optional[ScoreFunction] = None
+_worker_train_samples: Optional[TrainSamples] = None
+_worker_features_costs: Optional[list] = None
+
+
+def _init_worker(score_function: ScoreFunction, train_samples: TrainSamples, features_costs: list[float]):
+    """
+    Initializer for the workers of the process pool- saves the score function and the training data once per worker.
+    :param score_function: ScoreFunction object for calculating the weights on the edges.
+    :param train_samples: training dataset of the fitted LocalSearchAlgorithm.
+    :param features_costs: list of the costs of the features.
+    """
+    global _worker_score_function, _worker_train_samples, _worker_features_costs
+    _worker_score_function = score_function
+    _worker_train_samples = train_samples
+    _worker_features_costs = features_costs
+
+
+def _score_in_worker(given_features: GivenFeatures, new_feature: int) -> float:
+    """
+    Calculates the weight on an edge with the score function of the current worker process.
+    :param given_features: the features of the state.
+    :param new_feature: the added feature.
+    :return: the weight on the edge.
+    """
+    return _worker_score_function(train_samples=_worker_train_samples,
+                                  given_features=given_features,
+                                  new_feature=new_feature,
+                                  costs_list=_worker_features_costs)
+
+
+class FeaturesState(object):
+    """
+    FeaturesProblem's state- the features in it, their mask, their total cost and the total weight on the edges of the
+    path that the state was reached by. states are immutable, and equal iff they have the same features.
+    """
+    __slots__ = ('features', 'mask', 'cost', 'score')
+
+    def __init__(self, features: Tuple[int, ...], mask: int, cost: float, score: float):
+        object.__setattr__(self, 'features', features)
+        object.__setattr__(self, 'mask', mask)
+        object.__setattr__(self, 'cost', cost)
+        object.__setattr__(self, 'score', score)
+
+    def __setattr__(self, name: str, value):
+        raise AttributeError(f'{type(self).__name__} is immutable')
+
+    def __iter__(self):
+        return iter(self.features)
+
+    def __len__(self) -> int:
+        return len(self.features)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, FeaturesState) and self.mask == other.mask
+
+    def __hash__(self) -> int:
+        return hash(self.mask)
+
+    def __repr__(self) -> str:
+        return f'FeaturesState({list(self.features)}, cost={self.cost}, score={self.score})'
+
 
 class FeaturesProblem(SearchProblem):
     """
     SimpleAI's search problem for local search algorithm.
+    an action is a feature to add to the state, so a neighbor's cost and score are calculated from its parent's with
+    one score function call.
     """
     def __init__(self, initial_state: State, train_samples: TrainSamples, score_function: ScoreFunction, total_features: int,
-                 maximal_cost: float, features_costs: list[float]):
+                 maximal_cost: float, features_costs: list[float], scores: Optional[LRUCache] = None,
+                 executor: Optional[Executor] = None, workers_num: int = 1):
         """
         Init function for FeaturesProblem.
-        :param initial_state: FeaturesProblem's initial state. the local search algorithm will start the searching from this state.
+        :param initial_state: the given features. the local search algorithm will start the searching from this state.
         :param train_samples: training dataset contains training data of shape (n_samples, n_features), i.e samples are
             in the rows, and target values of shape (n_samples,).
         :param score_function: ScoreFunction object for calculating the weights on the edges.
@@ -33,76 +100,247 @@ class FeaturesProblem(SearchProblem):
         :param maximal_cost: the maximum available cost for buying features.
         :param features_costs: list in length number of features that contains the costs of each feature according to
             indices. in first index you will find the cost of the first feature, etc.
+        :param scores: (optional) cache of the weights on the edges, keyed by (the mask of the features, new feature).
+            it can be shared between problems on the same train samples, features costs and score function.
+        :param executor: (optional) process pool, which its workers were initialized with _init_worker. if given, the
+            weights on the edges of a state's neighborhood are calculated concurrently when its actions are generated.
+        :param workers_num: the number of the executor's workers.
         """
-        super().__init__(initial_state)
         self._train_samples = train_samples
         self._score_function = score_function
         self._total_features = total_features
-        self._given_features = initial_state
+        self._given_features = [int(feature) for feature in initial_state]
         self._maximal_cost = maximal_cost
         self._features_costs = features_costs
-        self._initial_state = initial_state.copy()
-        self._scores = {}
+        self._scores = LRUCache(None) if scores is None else scores
+        self._executor = executor
+        self._workers_num = workers_num
+        self._features_by_cost = sorted(get_complementary_set(range(total_features), self._given_features),
+                                        key=lambda feature: (features_costs[feature], feature))
+        self._sorted_costs = [features_costs[feature] for feature in self._features_by_cost]
+        super().__init__(FeaturesState(tuple(self._given_features), get_features_mask(self._given_features),
+                                       sum(features_costs[feature] for feature in self._given_features), 0.0))
 
     # Public Methods
-    def actions(self, state: State) -> List[State]:
+    def actions(self, state: FeaturesState) -> List[int]:
         """
         Receives a state, and returns the list of actions that can be performed from that particular state.
         :param state: FeaturesProblem's state.
-        :return: list of actions that can be performed from that particular state.
+        :return: list of the features that can be added to the state in the remaining budget, in ascending order.
         """
-        return [list(np.append(state, feature)) for feature in get_complementary_set(range(self._total_features), state)]
+        affordable_num = bisect.bisect_right(self._sorted_costs, self._maximal_cost - state.cost)
+        actions = sorted(feature for feature in self._features_by_cost[:affordable_num] if not state.mask >> feature & 1)
+        if self._executor is not None:
+            self._prefetch_edge_scores(state, actions)
+        return actions
 
-    def result(self, last_state: State, new_state: State) -> State:
+    def result(self, state: FeaturesState, action: int) -> FeaturesState:
         """
         Returns the resulting state of applying that particular action from that particular state.
-        :param last_state: FeaturesProblem's state before the action was performed on it.
-        :param new_state: FeaturesProblem's state after the action was performed on it.
+        :param state: FeaturesProblem's state before the action was performed on it.
+        :param action: the feature that is added to the state.
         :return: resulting state of applying that particular action from that particular state.
         """
-        return new_state
+        cost = state.cost + self._features_costs[action]
+        score = state.score + self._get_edge_score(state.features, state.mask, action) if cost <= self._maximal_cost else -np.inf
+        return FeaturesState(state.features + (action,), state.mask | 1 << action, cost, score)
 
-    def value(self, state: State) -> float:
+    def value(self, state: FeaturesState) -> float:
         """
         Receives a state, and returns a valuation (“score”) of that value. Better states have higher scores.
         :param state: FeaturesProblem's state.
         :return: the value of the state.
         """
-        return self._calculate_score(state) if self._is_valid_state(state) else -np.inf
+        return state.score if state.cost <= self._maximal_cost else -np.inf
 
-    def generate_random_state(self) -> State:
+    def generate_random_state(self) -> FeaturesState:
         """
-        Return a randomly generated state.
+        Return a randomly generated state. the features that aren't given are visited in a random order, and every
+        feature that its cost is in the remaining budget is added with probability 0.5, so the state is always valid.
+        the features are drawn first, and then the state is valued along the drawn order as result would value it, so
+        it has the same score as the state that is reached by adding its features in that order.
         :return: randomly generated state
         """
-        states = [list(np.append(sub_set, self._given_features).astype(np.int)) for sub_set in powerset(get_complementary_set(range(self._total_features), self._given_features))]
-        return random.choice(states)
+        state = self.initial_state
+        free_features = list(get_complementary_set(range(self._total_features), self._given_features))
+        random.shuffle(free_features)
+        added_features, cost = [], state.cost
+        for feature in free_features:
+            if cost + self._features_costs[feature] <= self._maximal_cost and random.random() < 0.5:
+                added_features.append(feature)
+                cost += self._features_costs[feature]
+        for feature in added_features:
+            state = self.result(state, feature)
+        return state
+
+    def get_candidate_gains(self, state: FeaturesState) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Receives a state, and returns the features that can be added to it with the weights on their edges. the weights
+        that aren't cached are calculated with one score_candidates call.
+        :param state: FeaturesProblem's state.
+        :return: array of the features (the state's actions), and array of the weights on their edges.
+        """
+        candidates = self.actions(state)
+        return np.array(candidates, dtype=int), self._get_edge_scores(state, candidates)
+
+    def generate_random_states(self, states_num: int) -> List[FeaturesState]:
+        """
+        Return randomly generated states, e.g for the initial states of random restarts.
+        :param states_num: the number of the states.
+        :return: list of randomly generated states.
+        """
+        return [self.generate_random_state() for _ in range(states_num)]
 
     # Private Methods
-    def _is_valid_state(self, state: State) -> bool:
+    def _get_edge_scores(self, state: FeaturesState, new_features: List[int]) -> np.ndarray:
         """
-        Returns if the state is valid. a valid state is a state that the features in it are below the maximal cost.
+        Gets the weights on the edges from the state to the states with each of the new features. the weights that
+        aren't cached are calculated with one score_candidates call.
         :param state: FeaturesProblem's state.
-        :return: if the state is valid or not.
+        :param new_features: the added features.
+        :return: array of the weights on the edges.
         """
-        return sum(self._features_costs[feature] for feature in state) <= self._maximal_cost
+        missing = [feature for feature in new_features if (state.mask, feature) not in self._scores]
+        if missing:
+            scores = self._score_function.score_candidates(self._train_samples, list(state.features), missing, self._features_costs)
+            for feature, score in zip(missing, scores):
+                self._scores.put((state.mask, feature), score)
+        return np.array([self._get_edge_score(state.features, state.mask, feature) for feature in new_features], dtype=float)
 
-    def _calculate_score(self, state: State) -> float:
+    def _prefetch_edge_scores(self, state: FeaturesState, actions: List[int]):
         """
-        Calculates the value of the given state.
+        Calculates the weights on the edges from the state to its neighbors in the executor's workers, and caches them.
         :param state: FeaturesProblem's state.
-        :return: the value of the state.
+        :param actions: the features that are added to the state.
+        """
+        missing = [action for action in actions if (state.mask, action) not in self._scores]
+        if len(missing) < 2:
+            return
+        chunksize = max(1, len(missing) // (4 * self._workers_num))
+        scores = self._executor.map(_score_in_worker, itertools.repeat(list(state.features)), missing, chunksize=chunksize)
+        for action, score in zip(missing, scores):
+            self._scores.put((state.mask, action), score)
+
+    def _get_edge_score(self, states: Tuple[int, ...], mask: int, new_feature: int) -> float:
+        """
+        Gets the weight on the edge from the given state to the state with the new feature, from the cache if it's there.
+        :param states: the features of FeaturesProblem's state.
+        :param mask: the mask of the features in the state.
+        :param new_feature: the added feature.
+        :return: the weight on the edge.
         """
-        total_score, states = 0, self._initial_state.copy()
-        for new_feature in get_complementary_set(state, self._initial_state):
-            if f'{states}+{new_feature}' not in self._scores:
-                self._scores[f'{states}+{new_feature}'] = self._score_function(train_samples=self._train_samples,
-                                                                               given_features=states,
-                                                                               new_feature=new_feature,
-                                                                               costs_list=self._features_costs)
-            total_score += self._scores[f'{states}+{new_feature}']
-            states.append(new_feature)
-        return total_score
+        score = self._scores.get((mask, new_feature))
+        if score is None:
+            score = self._score_function(train_samples=self._train_samples,
+                                         given_features=list(states),
+                                         new_feature=new_feature,
+                                         costs_list=self._features_costs)
+            self._scores.put((mask, new_feature), score)
+        return score
+
+
+""""""""""""""""""""""""""""""""""""""""" Search Engines """""""""""""""""""""""""""""""""""""""
+
+
+@dataclass
+class SearchResult(object):
+    """
+    The result of a native search engine, like simpleai's search node.
+    """
+    state: FeaturesState
+    value: float
+
+
+def native_hill_climbing(problem: FeaturesProblem, iterations_limit: int = 0) -> SearchResult:
+    """
+    Hill climbing on the gains of all the candidates of a state at once. the same as simpleai's hill_climbing- the
+    last neighbor with the best value is chosen, and the search stops once it isn't better than the current state.
+    :param problem: FeaturesProblem.
+    :param iterations_limit: if specified, the search ends after that number of iterations.
+    :return: SearchResult of the best state.
+    """
+    state, value = problem.initial_state, problem.value(problem.initial_state)
+    iteration = 0
+    while True:
+        candidates, gains = problem.get_candidate_gains(state)
+        iteration += 1
+        if not len(candidates):
+            break
+        values = state.score + gains
+        best = len(values) - 1 - int(np.argmax(values[::-1]))
+        if values[best] < value:
+            break
+        old_value = value
+        state, value = problem.result(state, int(candidates[best])), values[best]
+        if (iterations_limit and iteration >= iterations_limit) or old_value >= value:
+            break
+    return SearchResult(state, value)
+
+
+def native_hill_climbing_stochastic(problem: FeaturesProblem, iterations_limit: int = 0) -> SearchResult:
+    """
+    Stochastic hill climbing on the gains of all the candidates of a state at once. the same as simpleai's
+    hill_climbing_stochastic- a random neighbor that is better than the current state is chosen in every iteration.
+    :param problem: FeaturesProblem.
+    :param iterations_limit: if specified, the search ends after that number of iterations. else, it continues until
+        there isn't a better neighbor.
+    :return: SearchResult of the best state.
+    """
+    state, value = problem.initial_state, problem.value(problem.initial_state)
+    iteration = 0
+    while True:
+        candidates, gains = problem.get_candidate_gains(state)
+        iteration += 1
+        betters = np.flatnonzero(state.score + gains > value)
+        if len(betters):
+            chosen = random.choice(list(betters))
+            state, value = problem.result(state, int(candidates[chosen])), state.score + gains[chosen]
+        if iterations_limit:
+            if iteration >= iterations_limit:
+                break
+        elif not len(betters):
+            break
+    return SearchResult(state, value)
+
+
+def native_beam(problem: FeaturesProblem, beam_size: int = 10, iterations_limit: int = 0) -> SearchResult:
+    """
+    Beam search from the initial state on the gains of all the candidates of the beam's states at once. in every
+    iteration the beam is the best distinct states among the beam and its neighbors.
+    :param problem: FeaturesProblem.
+    :param beam_size: the number of the states in the beam.
+    :param iterations_limit: if specified, the search ends after that number of iterations. else, it continues until
+        the best state isn't improved.
+    :return: SearchResult of the best state.
+    """
+    beam = [(problem.value(problem.initial_state), problem.initial_state)]
+    iteration = 0
+    while True:
+        old_value = beam[0][0]
+        parents, features, values = [], [], []
+        for value, state in beam:
+            parents.append(state)
+            features.append(-1)
+            values.append(value)
+            candidates, gains = problem.get_candidate_gains(state)
+            parents.extend([state] * len(candidates))
+            features.extend(candidates.tolist())
+            values.extend((state.score + gains).tolist())
+        seen, new_beam = set(), []
+        for index in np.argsort(-np.array(values), kind='stable'):
+            mask = parents[index].mask if features[index] < 0 else parents[index].mask | 1 << features[index]
+            if mask in seen:
+                continue
+            seen.add(mask)
+            state = parents[index] if features[index] < 0 else problem.result(parents[index], features[index])
+            new_beam.append((values[index], state))
+            if len(new_beam) == beam_size:
+                break
+        beam = new_beam
+        iteration += 1
+        if (iterations_limit and iteration >= iterations_limit) or (not iterations_limit and old_value >= beam[0][0]):
+            break
+    return SearchResult(beam[0][1], beam[0][0])
 
 
 """"""""""""""""""""""""""""""""""""""""""" Classes """""""""""""""""""""""""""""""""""""""""""
@@ -114,18 +352,63 @@ class LocalSearchAlgorithm(SequenceAlgorithm):
     """
 
     # Public Methods
-    def __init__(self, classifier: sklearn.base.ClassifierMixin, local_search_algorithm: Callable, score_function: ScoreFunction, **kw):
+    def __init__(self, classifier: sklearn.base.ClassifierMixin, local_search_algorithm: Callable, score_function: ScoreFunction,
+                 score_cache_size: Optional[int] = 65536, model_cache_size: Optional[int] = 16,
+                 plan_cache_size: Optional[int] = 1024, plan_cache_path: Optional[str] = None, n_jobs: Optional[int] = None, **kw):
         """
         Init function for LocalSearchAlgorithm algorithm.
         :param classifier: sklearn's classifier. the function saves it and uses it later.
-        :param local_search_algorithm: simpleai's local search algorithm.
+        :param local_search_algorithm: simpleai's local search algorithm, or one of the native engines-
+            native_hill_climbing, native_hill_climbing_stochastic and native_beam.
         :param score_function: ScoreFunction object for calculating the score of the states.
+        :param score_cache_size: the maximal number of the score function's results that are kept across the queries.
+            if None, the cache is unbounded.
+        :param model_cache_size: the maximal number of fitted classifiers that are kept, one per bought subset of
+            features.
+        :param plan_cache_size: the maximal number of bought subsets that are kept, one per query.
+        :param plan_cache_path: (optional) a file that the bought subsets are saved to and loaded from.
+        :param n_jobs: the number of worker processes that calculate the weights on the edges of each neighborhood. if
+            None or 1, they are calculated in the current process. -1 means using all processors. the score function
+            must be picklable. the workers are started by fit, and are kept until the next fit or close.
         """
-        super().__init__(classifier)
+        super().__init__(classifier, model_cache_size, plan_cache_size, plan_cache_path)
         self._local_search_algorithm = local_search_algorithm
         self._score_function = score_function
+        self._scores = LRUCache(score_cache_size)
+        self._n_jobs = os.cpu_count() if n_jobs == -1 else n_jobs
+        self._executor = None
         self._kw = kw
 
+    def fit(self, train_samples: TrainSamples, features_costs: list[float]):
+        """
+        Trains the classifier. the function saves the train samples and the features costs for the prediction, and
+        drops the scores that were calculated on the previous ones. the worker processes, if any, are restarted with the new
+        training data.
+        :param train_samples: training dataset contains training data of shape (n_samples, n_features), i.e samples are
+        in the rows, and target values of shape (n_samples,). the function saves it.
+        :param features_costs: list in length number of features that contains the costs of each feature according to
+        indices. in first index you will find the cost of the first feature, etc. the function saves it.
+        """
+        super().fit(train_samples, features_costs)
+        self._scores.clear()
+        self.close()
+        if self._n_jobs is not None and self._n_jobs > 1:
+            self._executor = ProcessPoolExecutor(max_workers=self._n_jobs, initializer=_init_worker,
+                                                 initargs=(self._score_function, train_samples, features_costs))
+
+    def close(self):
+        """
+        Shuts down the worker processes, if there are any.
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def get_params(self) -> dict:
+        parameters = super().get_params()
+        parameters.update(local_search_algorithm=self._local_search_algorithm, score_function=self._score_function, **self._kw)
+        return parameters
+
     # Private Methods
     def _buy_features(self, given_features: GivenFeatures, maximal_cost: float) -> GivenFeatures:
         """
@@ -138,7 +421,7 @@ class LocalSearchAlgorithm(SequenceAlgorithm):
         best_state = self._get_best_state(given_features, maximal_cost)
         return sorted(best_state)
 
-    def _get_best_state(self, given_features: GivenFeatures, maximal_cost: float) -> State:
+    def _get_best_state(self, given_features: GivenFeatures, maximal_cost: float) -> FeaturesState:
         """
         Performs local search algorithm on the score function.
         :param given_features: list of the indices of the chosen features.
@@ -150,5 +433,8 @@ class LocalSearchAlgorithm(SequenceAlgorithm):
                                         score_function=self._score_function,
                                         total_features=self._train_samples.get_features_num(),
                                         maximal_cost=maximal_cost,
-                                        features_costs=self._features_costs)
+                                        features_costs=self._features_costs,
+                                        scores=self._scores,
+                                        executor=self._executor,
+                                        workers_num=self._n_jobs or 1)
         return self._local_search_algorithm(initial_state, **self._kw).state
@@ -13,12 +13,17 @@ class MaxVarianceAlgorithm(SequenceAlgorithm):
     """
     A partially sophisticated algorithm that choose to buy the feature with the most variance in each stage.
     """
-    def __init__(self, classifier: sklearn.base.ClassifierMixin):
+    def __init__(self, classifier: sklearn.base.ClassifierMixin, model_cache_size: Optional[int] = 16,
+                 plan_cache_size: Optional[int] = 1024, plan_cache_path: Optional[str] = None):
         """
         Init function.
         :param classifier: sklearn's classifier. the function saves it and uses it later.
+        :param model_cache_size: the maximal number of fitted classifiers that are kept, one per bought subset of
+            features.
+        :param plan_cache_size: the maximal number of bought subsets that are kept, one per query.
+        :param plan_cache_path: (optional) a file that the bought subsets are saved to and loaded from.
         """
-        super().__init__(classifier)
+        super().__init__(classifier, model_cache_size, plan_cache_size, plan_cache_path)
         self._features_by_corr = None
 
     def fit(self, train_samples: TrainSamples, features_costs: list[float]):
@@ -29,8 +34,7 @@ class MaxVarianceAlgorithm(SequenceAlgorithm):
         :param features_costs: list in length number of features that contains the costs of each feature according to
         indices. in first index you will find the cost of the first feature, etc.
         """
-        self._train_samples = train_samples
-        self._features_costs = features_costs
+        super().fit(train_samples, features_costs)
         correlations = np.var(train_samples.samples, axis=0)
         args_sort = np.argsort(correlations)
         self._features_by_corr = np.array(args_sort[::-1]).tolist()
@@ -4,7 +4,7 @@ This module contains naive algorithms
 
 """"""""""""""""""""""""""""""""""""""""""" Imports """""""""""""""""""""""""""""""""""""""""""
 from General.utils import *
-from LearningAlgorithms.abstract_algorithm import LearningAlgorithm, SequenceAlgorithm
+from LearningAlgorithms.abstract_algorithm import LearningAlgorithm, SequenceAlgorithm, ModelCache
 
 """"""""""""""""""""""""""""""""""""""""""" Classes """""""""""""""""""""""""""""""""""""""""""
 
@@ -14,14 +14,17 @@ class EmptyAlgorithm(LearningAlgorithm):
     A naive algorithm that ignores the option to buy features and runs sklearn's classifier for samples filtering the\
     given features only.
     """
-    def __init__(self, classifier: sklearn.base.ClassifierMixin):
+    def __init__(self, classifier: sklearn.base.ClassifierMixin, model_cache_size: Optional[int] = 16):
         """
         Init function.
         :param classifier: sklearn's classifier. the function saves it and uses it later.
+        :param model_cache_size: the maximal number of fitted classifiers that are kept, one per subset of given
+            features. if None, the cache is unbounded. if 0, the classifier is fitted on every prediction.
         """
         super().__init__()
         self._train_samples = None
         self._classifier = classifier
+        self._model_cache = ModelCache(classifier, model_cache_size)
 
     def fit(self, train_samples: TrainSamples, features_costs: list[float]):
         """
@@ -32,6 +35,7 @@ class EmptyAlgorithm(LearningAlgorithm):
         indices. in first index you will find the cost of the first feature, etc.
         """
         self._train_samples = train_samples
+        self._model_cache.clear()
 
     def predict(self, samples: TestSamples, given_features: GivenFeatures, maximal_cost: float) -> Classes:
         """
@@ -42,18 +46,23 @@ class EmptyAlgorithm(LearningAlgorithm):
         :param maximal_cost: the maximum available cost for buying features.
         :return: Classes of shape (n_samples,) contains the class labels for each data sample.
         """
-        self._classifier.fit(self._train_samples.samples[:, given_features], self._train_samples.classes)
-        return self._classifier.predict(samples[:, given_features])
+        return self._model_cache.predict(self._train_samples, samples, given_features)
 
 
 class RandomAlgorithm(SequenceAlgorithm):
     """
     A naive algorithm that chooses randomly features to add to the given features according to the given budget.
     """
-    def __init__(self, classifier: sklearn.base.ClassifierMixin, random_seed: Optional[int] = 0):
-        super().__init__(classifier)
+    def __init__(self, classifier: sklearn.base.ClassifierMixin, random_seed: Optional[int] = 0, model_cache_size: Optional[int] = 16,
+                 plan_cache_size: Optional[int] = 1024, plan_cache_path: Optional[str] = None):
+        super().__init__(classifier, model_cache_size, plan_cache_size, plan_cache_path)
         self._random_seed = random_seed
 
+    def get_params(self) -> dict:
+        parameters = super().get_params()
+        parameters.update(random_seed=self._random_seed)
+        return parameters
+
     # Private Methods
     def _buy_features(self, given_features: GivenFeatures, maximal_cost: float) -> GivenFeatures:
         """
@@ -78,8 +87,9 @@ class OptimalAlgorithm(SequenceAlgorithm):
     """
     A naive algorithm that chooses the cheapest features to add to the given features according to the given budget.
     """
-    def __init__(self, classifier: sklearn.base.ClassifierMixin):
-        super().__init__(classifier)
+    def __init__(self, classifier: sklearn.base.ClassifierMixin, model_cache_size: Optional[int] = 16,
+                 plan_cache_size: Optional[int] = 1024, plan_cache_path: Optional[str] = None):
+        super().__init__(classifier, model_cache_size, plan_cache_size, plan_cache_path)
 
     # Private Methods
     def _buy_features(self, given_features: GivenFeatures, maximal_cost: float) -> GivenFeatures:
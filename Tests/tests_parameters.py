@@ -23,6 +23,7 @@ TEST_SAMPLE = np.array([1])
 
 # Algorithms parameters
 CLASSIFIER = KNeighborsClassifier(n_neighbors=1)
+KNN_CLASSIFIER = KNeighborsClassifier(n_neighbors=3)
 GIVEN_FEATURE_EMPTY = []
 GIVEN_FEATURE_ONE = [1]
 GIVEN_FEATURES = [0, 1, 2]
@@ -36,6 +37,30 @@ MAXIMAL_COST_LOW = 10
 MAXIMAL_COST_HIGH = 1000
 MAXIMAL_COST_PARTIALLY = 4
 CONSIDERED_FEATURES_NUM = 6
+GENOME = [1, 1, 0, 1, 0, 0]
+GENOME_OVER_BUDGET = [1, 1, 1, 1, 1, 1]
+GA_NUM_POP = 10
+GA_NUM_GEN = 3
+N_JOBS = 2
+N_ISLANDS = 3
+FIDELITY_SCHEDULE = [0.5, 1.0]
+TINY_FIDELITY = 0.01
+VALIDATION_TOP_K = 3
+PLAN_CACHE_FILE = "plans.pkl"
+SCORE_CACHE_FILE = "scores.sqlite"
+SCORE_CACHE_SIZE = 5
+SCORE_CACHE_TIMEOUT = 0.1
+WIDE_FEATURES_NUM = 55
+RANDOM_STATES_NUM = 20
+BEAM_SIZE = 3
+CONTINUOUS_SAMPLES_SHAPE = (60, 6)
+SAMPLE_FRACTION = 0.3
+EVEN_FEATURES = [0, 2, 4]
+CATEGORICAL_TRAIN = np.array([["a", 1.5], ["b", 2.5], ["a", 0.5], ["c", 3.5]], dtype=object)
+CATEGORICAL_TEST = np.array([["a", 1.0], ["b", 2.0]], dtype=object)
+CATEGORICAL_TRAIN_CLASSES = np.array([0, 1, 0, 1])
+CATEGORICAL_TEST_CLASSES = np.array([0, 1])
+CATEGORICAL_COLUMNS_RANGES = [(0, 2), (2, 2)]
 
 # Dataset parameters
 RANDOM_SEED = 0
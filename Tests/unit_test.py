@@ -4,17 +4,24 @@ Automation Tests For The Project
 
 """"""""""""""""""""""""""""""""""""""""""" Imports """""""""""""""""""""""""""""""""""""""""""
 import unittest
+import tempfile
+import warnings
+import scipy.stats as stats
+from sklearn.linear_model import LogisticRegression
 from Tests.tests_parameters import *
 from networkx.algorithms.shortest_paths.astar import astar_path
 from networkx.algorithms.shortest_paths.generic import shortest_path
-from simpleai.search.local import hill_climbing
+from simpleai.search.local import hill_climbing, hill_climbing_stochastic
 
 from General.score import ScoreFunction, ScoreFunctionA, ScoreFunctionB
 from LearningAlgorithms.abstract_algorithm import LearningAlgorithm
 from LearningAlgorithms.naive_algorithm import EmptyAlgorithm, RandomAlgorithm, OptimalAlgorithm
 from LearningAlgorithms.mid_algorithm import MaxVarianceAlgorithm
-from LearningAlgorithms.local_search_algorithm import LocalSearchAlgorithm
-from LearningAlgorithms.genetic_algorithm import GeneticAlgorithm
+from LearningAlgorithms.local_search_algorithm import LocalSearchAlgorithm, FeaturesProblem, native_hill_climbing, \
+    native_hill_climbing_stochastic, native_beam
+from LearningAlgorithms.lazy_greedy_algorithm import LazyGreedyAlgorithm
+from LearningAlgorithms.genetic_algorithm import GeneticAlgorithm, GenomeScorer, TEST_SPLIT, VALIDATION_SPLIT, FULL_FIDELITY, \
+    NUMPY_ENGINE, PARETO_OBJECTIVE, _repair_genomes
 
 """"""""""""""""""""""""""""""""""""""""" Utils  """""""""""""""""""""""""""""""""""""""""
 
@@ -53,6 +60,20 @@ class TestUtils(unittest.TestCase):
         self.assertTrue(np.array_equal(train_samples.samples, TRAIN_SAMPLE))
         self.assertTrue(np.array_equal(train_samples.classes, TRAIN_CLASSES))
 
+    def test_lru_cache(self):
+        cache = LRUCache(max_size=2)
+        cache.put(0, "a")
+        cache.put(1, "b")
+        self.assertEqual(cache.get(0), "a")
+        cache.put(2, "c")
+        self.assertTrue(0 in cache and 2 in cache and 1 not in cache)
+        self.assertIsNone(cache.get(1))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_get_features_mask(self):
+        self.assertEqual(get_features_mask([0, 3]), 0b1001)
+        self.assertEqual(get_features_mask([3, 0]), get_features_mask([0, 3]))
+
     # private functions
     def _test_get_samples_from_csv(self, path: str, expected_matrix: np.array, preprocess: Callable = None, **kw):
         for col in range(expected_matrix.shape[1]):
@@ -131,6 +152,52 @@ class TestNaiveAlgorithm(unittest.TestCase):
     def test_mid_algorithm(self):
         self.assertTrue(self._test_mid_algorithm(MaxVarianceAlgorithm)[0])
 
+    def test_predict_batch(self):
+        algorithm = OptimalAlgorithm(classifier=CLASSIFIER)
+        algorithm.fit(train_samples=TRAIN_SAMPLES_BIG, features_costs=get_features_cost_in_order(TRAIN_SAMPLES_BIG.get_features_num()))
+        queries = [(GIVEN_FEATURES, MAXIMAL_COST_LOW), (GIVEN_FEATURES_MISSED, MAXIMAL_COST_LOW), (GIVEN_FEATURES, MAXIMAL_COST_LOW)]
+        predictions = algorithm.predict_batch(TRAIN_SAMPLES_BIG.samples, queries)
+        self.assertEqual(predictions.shape, (len(queries), TRAIN_SAMPLES_BIG.get_samples_num()))
+        for prediction, (given_features, maximal_cost) in zip(predictions, queries):
+            self.assertTrue(np.array_equal(prediction, algorithm.predict(TRAIN_SAMPLES_BIG.samples, list(given_features), maximal_cost)))
+
+    def test_plan_cache(self):
+        features_costs = get_features_cost_in_order(TRAIN_SAMPLES_BIG.get_features_num())
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, PLAN_CACHE_FILE)
+            algorithm = RandomAlgorithm(classifier=CLASSIFIER, plan_cache_path=path)
+            algorithm.fit(train_samples=TRAIN_SAMPLES_BIG, features_costs=features_costs)
+            given_features = list(GIVEN_FEATURE_EMPTY)
+            first = algorithm.predict(TRAIN_SAMPLES_BIG.samples, given_features, MAXIMAL_COST_PARTIALLY)
+            second = algorithm.predict(TRAIN_SAMPLES_BIG.samples, given_features, MAXIMAL_COST_PARTIALLY)
+            self.assertEqual(given_features, GIVEN_FEATURE_EMPTY)
+            self.assertTrue(np.array_equal(first, second))
+            self.assertEqual(algorithm.get_plan_cache_hit_rate(), 0.5)
+            self.assertFalse(os.path.exists(path))
+            algorithm.save_plan_cache()
+
+            algorithm = RandomAlgorithm(classifier=CLASSIFIER, plan_cache_path=path)
+            algorithm.fit(train_samples=TRAIN_SAMPLES_BIG, features_costs=features_costs)
+            algorithm.predict(TRAIN_SAMPLES_BIG.samples, given_features, MAXIMAL_COST_PARTIALLY)
+            self.assertEqual(algorithm.get_plan_cache_hit_rate(), 1.0)
+
+            # a different configuration doesn't load the plans of another one
+            for algorithm in (RandomAlgorithm(classifier=CLASSIFIER, random_seed=RANDOM_SEED + 1, plan_cache_path=path),
+                              OptimalAlgorithm(classifier=CLASSIFIER, plan_cache_path=path)):
+                algorithm.fit(train_samples=TRAIN_SAMPLES_BIG, features_costs=features_costs)
+                algorithm.predict_batch(TRAIN_SAMPLES_BIG.samples, [(given_features, MAXIMAL_COST_PARTIALLY)])
+                self.assertEqual(algorithm.get_plan_cache_hit_rate(), 0.0)
+
+    def test_model_cache(self):
+        algorithm = EmptyAlgorithm(classifier=CLASSIFIER)
+        algorithm.fit(train_samples=TRAIN_SAMPLES_BIG, features_costs=get_features_cost_in_order(TRAIN_SAMPLES_BIG.get_features_num()))
+        first = algorithm.predict(samples=TRAIN_SAMPLES_BIG.samples, given_features=GIVEN_FEATURES, maximal_cost=MAXIMAL_COST_LOW)
+        second = algorithm.predict(samples=TRAIN_SAMPLES_BIG.samples, given_features=GIVEN_FEATURES[::-1], maximal_cost=MAXIMAL_COST_LOW)
+        self.assertTrue(np.array_equal(first, second))
+        self.assertEqual(algorithm._model_cache.get_hit_rate(), 0.5)
+        algorithm.fit(train_samples=TRAIN_SAMPLES_BIG, features_costs=get_features_cost_in_order(TRAIN_SAMPLES_BIG.get_features_num()))
+        self.assertEqual(algorithm._model_cache.get_hit_rate(), 0.0)
+
     # private functions
     @staticmethod
     def _test_initialization(tested_algorithm) -> bool:
@@ -138,8 +205,8 @@ class TestNaiveAlgorithm(unittest.TestCase):
         return type(algorithm) == tested_algorithm and hasattr(algorithm.predict, '__call__') and hasattr(algorithm.fit, '__call__')
 
     @staticmethod
-    def _test_naive_algorithm(tested_algorithm) -> Tuple[bool, Type[LearningAlgorithm]]:
-        algorithm = tested_algorithm(classifier=CLASSIFIER)
+    def _test_naive_algorithm(tested_algorithm, algorithm: Optional[LearningAlgorithm] = None) -> Tuple[bool, Type[LearningAlgorithm]]:
+        algorithm = tested_algorithm(classifier=CLASSIFIER) if algorithm is None else algorithm
         test_result = type(algorithm) == tested_algorithm
         algorithm.fit(train_samples=TRAIN_SAMPLES_BIG, features_costs=get_features_cost_in_order(TRAIN_SAMPLES_BIG.get_features_num()))
 
@@ -178,6 +245,48 @@ class TestNaiveAlgorithm(unittest.TestCase):
         return test_result, algorithm
 
 
+class TestLazyGreedyAlgorithm(unittest.TestCase):
+    # tests functions
+    def test_buy_features(self):
+        train_samples, _ = get_dataset(NUMERIC_SAMPLES_PATH, train_ratio=TRAIN_RATIO_BATCH[0])
+        features_costs = get_features_cost_in_order(train_samples.get_features_num())
+        algorithm = LazyGreedyAlgorithm(CLASSIFIER, self._get_price_score_function()())
+        algorithm.fit(train_samples, features_costs)
+        optimal_algorithm = OptimalAlgorithm(CLASSIFIER)
+        optimal_algorithm.fit(train_samples, features_costs)
+        for given_features in GIVEN_FEATURES_BATCH:
+            algorithm._evaluations = 0
+            bought_features = algorithm._buy_features(list(given_features), MAXIMAL_COST_LOW)
+            self.assertEqual(sorted(bought_features), sorted(optimal_algorithm._buy_features(list(given_features), MAXIMAL_COST_LOW)))
+            self.assertLessEqual(algorithm._evaluations, 2 * train_samples.get_features_num())
+
+    def test_lazy_greedy_algorithm(self):
+        algorithm = LazyGreedyAlgorithm(CLASSIFIER, ScoreFunctionB(classifier=CLASSIFIER))
+        self.assertTrue(TestNaiveAlgorithm._test_naive_algorithm(LazyGreedyAlgorithm, algorithm)[0])
+
+    def test_undefined_scores(self):
+        train_samples, _ = get_dataset(NUMERIC_SAMPLES_PATH, train_ratio=TRAIN_RATIO_BATCH[0])
+        features_costs = get_features_cost_in_order(train_samples.get_features_num())
+        algorithm = LazyGreedyAlgorithm(CLASSIFIER, ScoreFunctionA())
+        algorithm.fit(train_samples, features_costs)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            self.assertEqual(algorithm._buy_features(list(GIVEN_FEATURE_EMPTY), MAXIMAL_COST_HIGH), [])
+        algorithm = LazyGreedyAlgorithm(CLASSIFIER, self._get_price_score_function(undefined_features=EVEN_FEATURES)())
+        algorithm.fit(train_samples, features_costs)
+        bought_features = algorithm._buy_features(list(GIVEN_FEATURE_EMPTY), MAXIMAL_COST_HIGH)
+        self.assertTrue(len(bought_features))
+        self.assertFalse(set(bought_features) & set(EVEN_FEATURES))
+
+    # private functions
+    @staticmethod
+    def _get_price_score_function(undefined_features: Iterable[int] = ()):
+        class PriceScoreFunction(ScoreFunction):
+            def _execute_function(self, train_samples: TrainSamples, given_features: GivenFeatures, new_feature: int, costs_list: list[float]) -> float:
+                return np.nan if new_feature in undefined_features else 1 / costs_list[new_feature]
+        return PriceScoreFunction
+
+
 class TestScoreFunction(unittest.TestCase):
     # tests functions
     def test_function_scoreA_1(self):
@@ -208,6 +317,112 @@ class TestScoreFunction(unittest.TestCase):
                                                             new_feature=NEW_FEATURE_TWO,
                                                             costs_list=FEATURES_COST_IN_ORDER))
 
+    def test_correlations_tables(self):
+        score_function = ScoreFunctionA(alpha=ALPHA_TWO)
+        for samples in (CORR_MATRIX, [list(row) for row in CORR_MATRIX]):
+            self.assertEqual(A_ALPHA_TWO_RESULT, score_function(train_samples=TrainSamples(samples, CORR_CLASSES),
+                                                                given_features=GIVEN_FEATURES_FOR_SCORE_TEST_ALPHA_TWO,
+                                                                new_feature=NEW_FEATURE_ONE,
+                                                                costs_list=FEATURES_COST_IN_ORDER))
+        self.assertEqual(len(score_function._tables), 1)
+        self.assertEqual(score_function._tables.hits, 1)
+
+    def test_certainty_cache(self):
+        train_samples = TrainSamples(np.array(CORR_MATRIX), np.array(CORR_CLASSES))
+        score_function = ScoreFunctionB(classifier=CLASSIFIER, certainty_cache_size=None)
+        uncached_score_function = ScoreFunctionB(classifier=CLASSIFIER)
+        for given_features, new_feature in ((GIVEN_FEATURES_FOR_SCORE_TEST_ALPHA_ONE, NEW_FEATURE_ONE), ([NEW_FEATURE_ONE], GIVEN_FEATURES_FOR_SCORE_TEST_ALPHA_ONE[0])):
+            scores = [function(train_samples=train_samples, given_features=given_features, new_feature=new_feature, costs_list=FEATURES_COST_IN_ORDER)
+                      for function in (score_function, uncached_score_function)]
+            self.assertEqual(scores[0], scores[1])
+        self.assertEqual(score_function._certainties.hits, 1)
+
+    def test_knn_backend(self):
+        # continuous samples, so there are no neighbors in the same distance
+        rng = np.random.default_rng(RANDOM_SEED)
+        train_samples = TrainSamples(rng.normal(size=CONTINUOUS_SAMPLES_SHAPE), rng.integers(0, 2, CONTINUOUS_SAMPLES_SHAPE[0]))
+        features_costs = get_features_cost_in_order(train_samples.get_features_num())
+        candidates = list(get_complementary_set(range(train_samples.get_features_num()), GIVEN_FEATURES_BATCH[-1]))
+        scores = ScoreFunctionB(classifier=KNN_CLASSIFIER).score_candidates(train_samples, GIVEN_FEATURES_BATCH[-1], candidates, features_costs)
+        knn_scores = ScoreFunctionB(classifier=KNN_CLASSIFIER, knn_backend=True).score_candidates(train_samples, GIVEN_FEATURES_BATCH[-1], candidates, features_costs)
+        self.assertTrue(np.allclose(scores, knn_scores))
+
+        score_function = ScoreFunctionB(classifier=KNN_CLASSIFIER, knn_backend=True, leave_one_out=True)
+        features = GIVEN_FEATURES_BATCH[-1] + [candidates[0]]
+        classifier = sklearn.base.clone(KNN_CLASSIFIER).fit(train_samples.samples[:, features], train_samples.classes)
+        neighbors_classes = train_samples.classes[classifier.kneighbors(return_distance=False)]
+        probabilities = np.stack([np.mean(neighbors_classes == label, axis=1) for label in classifier.classes_], axis=1)
+        self.assertAlmostEqual(score_function(train_samples=train_samples, given_features=GIVEN_FEATURES_BATCH[-1],
+                                              new_feature=candidates[0], costs_list=features_costs),
+                               (1 - np.mean(stats.entropy(probabilities, axis=1))) / features_costs[candidates[0]])
+        with self.assertRaises(ValueError):
+            ScoreFunctionB(classifier=LogisticRegression(), knn_backend=True)
+        with self.assertRaises(ValueError):
+            ScoreFunctionB(classifier=KNN_CLASSIFIER, leave_one_out=True)
+
+    def test_subsample(self):
+        train_samples, _ = get_dataset(HEART_FAILURE_SAMPLES_PATH, train_ratio=TRAIN_RATIO, class_index=CLASS_INDEX)
+        features_costs = get_features_cost_in_order(train_samples.get_features_num())
+        score_function = ScoreFunctionB(classifier=KNN_CLASSIFIER, sample_size=SAMPLE_FRACTION)
+        samples, classes = score_function._get_samples(train_samples)
+        self.assertAlmostEqual(len(classes), SAMPLE_FRACTION * train_samples.get_samples_num(), delta=len(np.unique(classes)))
+        self.assertAlmostEqual(np.mean(classes), np.mean(train_samples.classes), delta=1 / len(classes))
+        score, variance = score_function.score_with_variance(train_samples, GIVEN_FEATURES_BATCH[-1], NEW_FEATURE_ONE, features_costs)
+        self.assertEqual(score, score_function(train_samples=train_samples, given_features=GIVEN_FEATURES_BATCH[-1],
+                                               new_feature=NEW_FEATURE_ONE, costs_list=features_costs))
+        self.assertGreater(variance, 0)
+        exact_score_function = ScoreFunctionB(classifier=KNN_CLASSIFIER)
+        self.assertEqual(exact_score_function.score_with_variance(train_samples, GIVEN_FEATURES_BATCH[-1], NEW_FEATURE_ONE, features_costs)[1], 0)
+
+    def test_score_candidates(self):
+        train_samples = TrainSamples(CORR_MATRIX, CORR_CLASSES)
+        for score_function in (ScoreFunctionA(alpha=ALPHA_TWO), ScoreFunctionB(classifier=CLASSIFIER, alpha=ALPHA_TWO)):
+            candidates = list(range(len(FEATURES_COST_IN_ORDER)))
+            scores = score_function.score_candidates(train_samples, GIVEN_FEATURES_FOR_SCORE_TEST_ALPHA_TWO, candidates, FEATURES_COST_IN_ORDER)
+            self.assertEqual(scores.shape, (len(candidates),))
+            for candidate, score in zip(candidates, scores):
+                self.assertAlmostEqual(score, score_function(train_samples=train_samples, given_features=GIVEN_FEATURES_FOR_SCORE_TEST_ALPHA_TWO,
+                                                             new_feature=candidate, costs_list=FEATURES_COST_IN_ORDER))
+
+    def test_persistent_cache(self):
+        train_samples = TrainSamples(CORR_MATRIX, CORR_CLASSES)
+        candidates = list(range(len(FEATURES_COST_IN_ORDER)))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, SCORE_CACHE_FILE)
+            scores = ScoreFunctionB(classifier=CLASSIFIER, cache_path=path).score_candidates(
+                train_samples, GIVEN_FEATURES_FOR_SCORE_TEST_ALPHA_TWO, candidates, FEATURES_COST_IN_ORDER)
+            score_function = ScoreFunctionB(classifier=CLASSIFIER, cache_path=path)
+            score_function._score_candidates = None
+            np.testing.assert_array_equal(scores, score_function.score_candidates(
+                train_samples, GIVEN_FEATURES_FOR_SCORE_TEST_ALPHA_TWO[::-1], candidates, FEATURES_COST_IN_ORDER))
+            other_score_function = ScoreFunctionB(classifier=CLASSIFIER, sample_size=SAMPLE_FRACTION, cache_path=path)
+            self.assertNotEqual(score_function._get_cache_prefix(train_samples, FEATURES_COST_IN_ORDER),
+                                other_score_function._get_cache_prefix(train_samples, FEATURES_COST_IN_ORDER))
+            self.assertEqual(score_function._get_cache_prefix(train_samples, FEATURES_COST_IN_ORDER),
+                             ScoreFunctionB(classifier=sklearn.base.clone(CLASSIFIER))._get_cache_prefix(train_samples, FEATURES_COST_IN_ORDER))
+
+            # the size is enforced when the file is opened and after every write
+            cache = PersistentCache(path, max_size=None)
+            cache.put_many({str(key): float(key) for key in range(2 * SCORE_CACHE_SIZE)})
+            cache.close()
+            cache = PersistentCache(path, SCORE_CACHE_SIZE, timeout=SCORE_CACHE_TIMEOUT)
+            self.assertEqual(len(cache), SCORE_CACHE_SIZE)
+            kept_keys = list(cache.get_many([str(key) for key in range(2 * SCORE_CACHE_SIZE)]))
+            # reads don't take the write lock, and the last read key is the most recently used
+            blocker = sqlite3.connect(path, isolation_level=None)
+            blocker.execute('BEGIN IMMEDIATE')
+            self.assertIn(kept_keys[0], cache.get_many(kept_keys[:1]))
+            blocker.execute('ROLLBACK')
+            blocker.close()
+            cache.put_many({f'new:{key}': float(key) for key in range(SCORE_CACHE_SIZE - 1)})
+            self.assertEqual(len(cache), SCORE_CACHE_SIZE)
+            self.assertEqual(list(cache.get_many(kept_keys)), kept_keys[:1])
+            # overwriting an entry doesn't change the number of entries, so nothing is evicted
+            cache.put_many({kept_keys[0]: 0.0})
+            self.assertEqual(len(cache), SCORE_CACHE_SIZE)
+            self.assertEqual(cache.get_many(kept_keys[:1]), {kept_keys[0]: 0.0})
+            cache.close()
+
 
 class TestLocalSearchAlgorithm(unittest.TestCase):
     # tests functions
@@ -223,6 +438,84 @@ class TestLocalSearchAlgorithm(unittest.TestCase):
             best_state = algorithm._get_best_state(GIVEN_FEATURES_BATCH[0], MAXIMAL_COST_HIGH)
             self.assertEqual(sorted(best_state), BEST_STATE_EXPECTED)
 
+    def test_score_cache(self):
+        train_samples, _ = get_dataset(NUMERIC_SAMPLES_PATH, train_ratio=TRAIN_RATIO_BATCH[0])
+        algorithm = self._get_algorithm_instance(LocalSearchAlgorithm, self._get_depth_score_function())
+        algorithm.fit(train_samples, get_features_cost_in_order(train_samples.get_features_num()))
+        algorithm._get_best_state(list(GIVEN_FEATURES_BATCH[-1]), MAXIMAL_COST_HIGH)
+        # the climb adds every free feature, and each edge of its neighborhoods is scored once
+        free_features_num = train_samples.get_features_num() - len(GIVEN_FEATURES_BATCH[-1])
+        edges_num = free_features_num * (free_features_num + 1) // 2
+        self.assertEqual((algorithm._scores.hits, algorithm._scores.misses), (0, edges_num))
+        best_state = algorithm._get_best_state(list(GIVEN_FEATURES_BATCH[-1])[::-1], MAXIMAL_COST_HIGH)
+        self.assertEqual(sorted(best_state), BEST_STATE_EXPECTED)
+        self.assertEqual(len(algorithm._scores), edges_num)
+        self.assertEqual((algorithm._scores.hits, algorithm._scores.misses), (edges_num, edges_num))
+
+    def test_generate_random_states(self):
+        features_costs = get_features_cost_in_order(WIDE_FEATURES_NUM)
+        problem = FeaturesProblem(initial_state=list(GIVEN_FEATURES_BATCH[-1]), train_samples=TRAIN_SAMPLES_BIG,
+                                  score_function=self._get_depth_score_function()(), total_features=WIDE_FEATURES_NUM,
+                                  maximal_cost=MAXIMAL_COST_HIGH, features_costs=features_costs)
+        states = problem.generate_random_states(RANDOM_STATES_NUM)
+        self.assertEqual(len(states), RANDOM_STATES_NUM)
+        for state in states:
+            self.assertTrue(set(GIVEN_FEATURES_BATCH[-1]) <= set(state))
+            self.assertEqual(len(set(state)), len(state))
+            self.assertLessEqual(sum(features_costs[feature] for feature in state), MAXIMAL_COST_HIGH)
+            self.assertEqual(state.cost, sum(features_costs[feature] for feature in state))
+            chained_state = problem.initial_state
+            for feature in state.features[len(GIVEN_FEATURES_BATCH[-1]):]:
+                chained_state = problem.result(chained_state, feature)
+            self.assertEqual(chained_state, state)
+            self.assertEqual(chained_state.score, state.score)
+
+    def test_incremental_state(self):
+        train_samples, _ = get_dataset(NUMERIC_SAMPLES_PATH, train_ratio=TRAIN_RATIO_BATCH[0])
+        features_costs = get_features_cost_in_order(train_samples.get_features_num())
+        problem = FeaturesProblem(initial_state=list(GIVEN_FEATURES_BATCH[-1]), train_samples=train_samples,
+                                  score_function=self._get_depth_score_function()(), total_features=train_samples.get_features_num(),
+                                  maximal_cost=MAXIMAL_COST_PARTIALLY + sum(features_costs[feature] for feature in GIVEN_FEATURES_BATCH[-1]),
+                                  features_costs=features_costs)
+        state = problem.initial_state
+        neighbors = [problem.result(state, action) for action in problem.actions(state)]
+        affordable_features = [feature for feature in range(train_samples.get_features_num())
+                               if feature not in GIVEN_FEATURES_BATCH[-1] and features_costs[feature] <= MAXIMAL_COST_PARTIALLY]
+        self.assertEqual([neighbor.features[-1] for neighbor in neighbors], affordable_features)
+        for neighbor in neighbors:
+            self.assertEqual(neighbor.cost, state.cost + features_costs[neighbor.features[-1]])
+            self.assertEqual(problem.value(neighbor), state.score + len(GIVEN_FEATURES_BATCH[-1]) + 1)
+        with self.assertRaises(AttributeError):
+            state.cost = 0
+
+    def test_parallel_neighborhood(self):
+        train_samples, _ = get_dataset(NUMERIC_SAMPLES_PATH, train_ratio=TRAIN_RATIO_BATCH[0])
+        features_costs = get_features_cost_in_order(train_samples.get_features_num())
+        best_states = []
+        for n_jobs in (None, N_JOBS):
+            algorithm = LocalSearchAlgorithm(CLASSIFIER, hill_climbing, ScoreFunctionB(classifier=CLASSIFIER), n_jobs=n_jobs)
+            algorithm.fit(train_samples, features_costs)
+            best_states.append(algorithm._get_best_state(list(GIVEN_FEATURES_BATCH[0]), MAXIMAL_COST_LOW))
+            algorithm.close()
+        self.assertEqual(best_states[0].features, best_states[1].features)
+        self.assertEqual(best_states[0].score, best_states[1].score)
+
+    def test_native_engines(self):
+        train_samples, _ = get_dataset(NUMERIC_SAMPLES_PATH, train_ratio=TRAIN_RATIO_BATCH[0])
+        features_costs = get_features_cost_in_order(train_samples.get_features_num())
+        for native_engine, simpleai_engine in ((native_hill_climbing, hill_climbing), (native_hill_climbing_stochastic, hill_climbing_stochastic)):
+            for given_features in GIVEN_FEATURES_BATCH:
+                results = []
+                for engine in (native_engine, simpleai_engine):
+                    random.seed(RANDOM_SEED)
+                    algorithm = LocalSearchAlgorithm(CLASSIFIER, engine, ScoreFunctionB(classifier=CLASSIFIER))
+                    algorithm.fit(train_samples, features_costs)
+                    results.append(algorithm._get_best_state(list(given_features), MAXIMAL_COST_LOW))
+                self.assertEqual(results[0].features, results[1].features)
+        algorithm = LocalSearchAlgorithm(CLASSIFIER, native_beam, self._get_depth_score_function()(), beam_size=BEAM_SIZE)
+        algorithm.fit(train_samples, features_costs)
+        self.assertEqual(sorted(algorithm._get_best_state(list(GIVEN_FEATURES_BATCH[0]), MAXIMAL_COST_HIGH)), BEST_STATE_EXPECTED)
+
     def test_local_search_algorithm(self):
         local_search_algorithm = self._get_algorithm_instance(LocalSearchAlgorithm, self._get_depth_score_function())
         self._full_classification_test(local_search_algorithm)
@@ -275,6 +568,127 @@ class TestGeneticAlgorithm(unittest.TestCase):
         res = algorithm._buy_features(GIVEN_FEATURES_BATCH[0], MAXIMAL_COST_LOW)
         self.assertTrue(algorithm._is_legal_subset(res))
 
+    def test_fitness_cache(self):
+        algorithm = GeneticAlgorithm(classifier=CLASSIFIER, considered_feature_num=CONSIDERED_FEATURES_NUM)
+        train_samples, _ = get_dataset(HEART_FAILURE_SAMPLES_PATH, train_ratio=TRAIN_RATIO, class_index=CLASS_INDEX)
+        algorithm.fit(train_samples, FEATURES_COST_LARGE)
+        algorithm._set_budget(GIVEN_FEATURES_BATCH[0], MAXIMAL_COST_LOW)
+        fitness = algorithm._get_fitness(GENOME, split=TEST_SPLIT)
+        self.assertEqual(algorithm._fitness_cache.misses, 1)
+        self.assertEqual(algorithm._get_fitness(list(GENOME), split=TEST_SPLIT), fitness)
+        self.assertEqual(algorithm._fitness_cache.hits, 1)
+        self.assertEqual(algorithm._get_fitness(GENOME_OVER_BUDGET, split=TEST_SPLIT), (-1,))
+        algorithm.fit(train_samples, FEATURES_COST_LARGE)
+        self.assertEqual(len(algorithm._fitness_cache), 0)
+
+    def test_numpy_engine(self):
+        algorithm = GeneticAlgorithm(classifier=CLASSIFIER, considered_feature_num=CONSIDERED_FEATURES_NUM, engine=NUMPY_ENGINE)
+        train_samples, _ = get_dataset(HEART_FAILURE_SAMPLES_PATH, train_ratio=TRAIN_RATIO, class_index=CLASS_INDEX)
+        algorithm.fit(train_samples, FEATURES_COST_LARGE)
+        res = algorithm._buy_features(list(GIVEN_FEATURES_BATCH[0]), MAXIMAL_COST_LOW)
+        self.assertTrue(algorithm._is_legal_subset(res))
+        self.assertEqual(algorithm._buy_features(list(GIVEN_FEATURES_BATCH[0]), MAXIMAL_COST_LOW), res)
+
+    def test_island_model(self):
+        algorithm = GeneticAlgorithm(classifier=CLASSIFIER, considered_feature_num=CONSIDERED_FEATURES_NUM, n_islands=N_ISLANDS)
+        train_samples, _ = get_dataset(HEART_FAILURE_SAMPLES_PATH, train_ratio=TRAIN_RATIO, class_index=CLASS_INDEX)
+        algorithm.fit(train_samples, FEATURES_COST_LARGE)
+        algorithm._num_pop, algorithm._num_gen = GA_NUM_POP, GA_NUM_GEN
+        res = algorithm._buy_features(list(GIVEN_FEATURES_BATCH[0]), MAXIMAL_COST_LOW)
+        self.assertTrue(algorithm._is_legal_subset(res))
+        self.assertEqual(algorithm._buy_features(list(GIVEN_FEATURES_BATCH[0]), MAXIMAL_COST_LOW), res)
+
+    def test_repair(self):
+        algorithm = GeneticAlgorithm(classifier=CLASSIFIER, considered_feature_num=CONSIDERED_FEATURES_NUM)
+        train_samples, _ = get_dataset(HEART_FAILURE_SAMPLES_PATH, train_ratio=TRAIN_RATIO, class_index=CLASS_INDEX)
+        algorithm.fit(train_samples, FEATURES_COST_LARGE)
+        algorithm._set_budget(GIVEN_FEATURES_BATCH[0], MAXIMAL_COST_LOW)
+        genomes = algorithm._get_random_genomes(np.random.default_rng(RANDOM_SEED), GA_NUM_POP)
+        genomes[0] = GENOME_OVER_BUDGET
+        _repair_genomes(genomes, algorithm._genome_costs, algorithm._max_cost, algorithm._repair_order)
+        self.assertTrue(algorithm._get_legal_genomes(genomes).all())
+        self.assertTrue(genomes[0][GIVEN_FEATURES_BATCH[0]].all())
+
+    def test_validation_candidates(self):
+        algorithm = GeneticAlgorithm(classifier=CLASSIFIER, considered_feature_num=CONSIDERED_FEATURES_NUM, validation_top_k=VALIDATION_TOP_K)
+        train_samples, _ = get_dataset(HEART_FAILURE_SAMPLES_PATH, train_ratio=TRAIN_RATIO, class_index=CLASS_INDEX)
+        algorithm.fit(train_samples, FEATURES_COST_LARGE)
+        algorithm._set_budget(GIVEN_FEATURES_BATCH[0], MAXIMAL_COST_LOW)
+        genomes = algorithm._get_random_genomes(np.random.default_rng(RANDOM_SEED), GA_NUM_POP)
+        hof = [(GENOME_OVER_BUDGET, 1.0), (list(genomes[0]), 0.9), (list(genomes[0]), 0.9)] + [(list(genome), 0.5) for genome in genomes[1:]]
+        candidates = algorithm._get_validation_candidates(hof)
+        self.assertEqual(len(candidates), VALIDATION_TOP_K)
+        self.assertEqual(candidates[0], hof[1])
+        self.assertTrue(algorithm._get_legal_genomes(np.array([genome for genome, _ in candidates])).all())
+
+    def test_multi_fidelity(self):
+        # the tolerance is wide, so the run never falls back to scoring on the whole data
+        algorithm = GeneticAlgorithm(classifier=CLASSIFIER, considered_feature_num=CONSIDERED_FEATURES_NUM,
+                                     fidelity_schedule=FIDELITY_SCHEDULE, fidelity_tolerance=FULL_FIDELITY)
+        train_samples, _ = get_dataset(HEART_FAILURE_SAMPLES_PATH, train_ratio=TRAIN_RATIO, class_index=CLASS_INDEX)
+        algorithm.fit(train_samples, FEATURES_COST_LARGE)
+        algorithm._num_pop, algorithm._num_gen = GA_NUM_POP, GA_NUM_GEN
+        calls = []
+        get_fitnesses = algorithm._get_fitnesses
+
+        def record_fitnesses(individuals, split, toolbox=None, fidelity=FULL_FIDELITY):
+            fitnesses = get_fitnesses(individuals, split, toolbox, fidelity)
+            calls.append((split, fidelity, len(individuals), sum(fit[0] >= 0 for fit in fitnesses)))
+            return fitnesses
+        algorithm._get_fitnesses = record_fitnesses
+        res = algorithm._buy_features(list(GIVEN_FEATURES_BATCH[0]), MAXIMAL_COST_LOW)
+        self.assertTrue(algorithm._is_legal_subset(res))
+
+        test_calls = [call for call in calls if call[0] == TEST_SPLIT]
+        partial_calls = [index for index, call in enumerate(test_calls) if call[1] < FULL_FIDELITY]
+        partial_generations = [gen for gen in range(GA_NUM_GEN + 1) if FIDELITY_SCHEDULE[min(gen, len(FIDELITY_SCHEDULE) - 1)] < FULL_FIDELITY]
+        self.assertEqual(len(partial_calls), len(partial_generations))
+        for index in partial_calls:
+            _, _, _, legal_num = test_calls[index]
+            self.assertEqual(test_calls[index + 1][1:3], (FULL_FIDELITY, int(np.ceil(algorithm._fidelity_top_fraction * legal_num))))
+        self.assertEqual(len(test_calls), 2 * len(partial_calls) + GA_NUM_GEN + 1 - len(partial_generations))
+        self.assertTrue(all(call[1] == FULL_FIDELITY for call in calls if call[0] == VALIDATION_SPLIT))
+
+        for parameters in ({'objective': PARETO_OBJECTIVE}, {'n_islands': N_ISLANDS}):
+            with self.assertRaises(ValueError):
+                GeneticAlgorithm(classifier=CLASSIFIER, fidelity_schedule=FIDELITY_SCHEDULE, **parameters)
+
+    def test_pareto_objective(self):
+        algorithm = GeneticAlgorithm(classifier=CLASSIFIER, considered_feature_num=CONSIDERED_FEATURES_NUM, objective=PARETO_OBJECTIVE)
+        train_samples, _ = get_dataset(HEART_FAILURE_SAMPLES_PATH, train_ratio=TRAIN_RATIO, class_index=CLASS_INDEX)
+        algorithm.fit(train_samples, FEATURES_COST_LARGE)
+        algorithm._num_pop, algorithm._num_gen = GA_NUM_POP, GA_NUM_GEN
+        for maximal_cost in [MAXIMAL_COST_PARTIALLY, MAXIMAL_COST_LOW, MAXIMAL_COST_HIGH]:
+            res = algorithm._buy_features(list(GIVEN_FEATURES_BATCH[0]), maximal_cost)
+            algorithm._max_cost = maximal_cost
+            self.assertTrue(algorithm._is_legal_subset(res))
+        self.assertEqual(len(algorithm._pareto_fronts), 1)
+
+    def test_genome_scorer_encoding(self):
+        splits = {TEST_SPLIT: (CATEGORICAL_TRAIN, CATEGORICAL_TEST, CATEGORICAL_TRAIN_CLASSES, CATEGORICAL_TEST_CLASSES)}
+        scorer = GenomeScorer(splits, max_iter=100)
+        X_train, X_test, _, _, columns_ranges = scorer._encoded_splits[TEST_SPLIT]
+        self.assertEqual(columns_ranges, CATEGORICAL_COLUMNS_RANGES)
+        self.assertEqual(X_train.shape[1], X_test.shape[1])
+        self.assertEqual(scorer.score(TEST_SPLIT, [1, 0]), 1)
+        scorer = GenomeScorer(splits, max_iter=100, fidelities=[TINY_FIDELITY])
+        self.assertEqual(set(CATEGORICAL_TRAIN_CLASSES[scorer._fidelity_rows[(TEST_SPLIT, TINY_FIDELITY)]]), set(CATEGORICAL_TRAIN_CLASSES))
+
+    def test_parallel_evaluation(self):
+        subsets = []
+        for n_jobs in [None, N_JOBS]:
+            algorithm = GeneticAlgorithm(classifier=CLASSIFIER, considered_feature_num=CONSIDERED_FEATURES_NUM, n_jobs=n_jobs)
+            train_samples, _ = get_dataset(HEART_FAILURE_SAMPLES_PATH, train_ratio=TRAIN_RATIO, class_index=CLASS_INDEX)
+            algorithm.fit(train_samples, FEATURES_COST_LARGE)
+            algorithm._num_pop, algorithm._num_gen = GA_NUM_POP, GA_NUM_GEN
+            executor = algorithm._executor
+            subsets.append([algorithm._buy_features(list(GIVEN_FEATURES_BATCH[0]), maximal_cost)
+                            for maximal_cost in (MAXIMAL_COST_LOW, MAXIMAL_COST_PARTIALLY)])
+            self.assertIs(algorithm._executor, executor)
+            algorithm.close()
+        self.assertIsNotNone(executor)
+        self.assertEqual(subsets[0], subsets[1])
+
 
 if __name__ == '__main__':
     unittest.main()